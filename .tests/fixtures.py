@@ -8,7 +8,6 @@ import sys
 
 sys.path.append(os.path.join(os.getcwd(), "rules/scripts"))
 
-from pyphypred.msa import MSA
 from pyphypred.raxmlng import RAxMLNG
 
 @pytest.fixture
@@ -17,25 +16,6 @@ def example_msa_path():
     return f"{cwd}/.tests/data/DNA/0.phy"
 
 
-@pytest.fixture
-def dna_phylip_msa(example_msa_path):
-    return MSA(example_msa_path)
-
-
-@pytest.fixture
-def dna_fasta_msa():
-    cwd = os.getcwd()
-    fasta_file = f"{cwd}/.tests/data/DNA/0.fasta"
-    return MSA(fasta_file)
-
-
-@pytest.fixture
-def small_msa():
-    cwd = os.getcwd()
-    phylip_file = f"{cwd}/.tests/data/DNA/small.fasta"
-    return MSA(phylip_file)
-
-
 @pytest.fixture
 def raxmlng_inference_log():
     cwd = os.getcwd()
@@ -48,6 +28,12 @@ def raxmlng_inference_restarted_log():
     return f"{cwd}/.tests/data/logs/raxml.inference.restart.log"
 
 
+@pytest.fixture
+def iqtree_inference_log():
+    cwd = os.getcwd()
+    return f"{cwd}/.tests/data/logs/iqtree.inference.log"
+
+
 @pytest.fixture
 def iqtree_siginficance_log():
     cwd = os.getcwd()
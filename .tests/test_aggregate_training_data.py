@@ -0,0 +1,88 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from fixtures import *
+
+from aggregate_training_data import aggregate_training_data, find_msa_databases
+from database import *
+from database_to_dataframe import add_derived_columns, read_dataset_table
+from parquet_writer import write_parquet_table
+
+
+def _dataset_row(i):
+    return dict(
+        uuid=f"{i:032x}",
+        verbose_name=f"msa_{i}",
+        data_type="DNA" if i % 3 else "AA",
+        num_searches=4,
+        avg_rfdist_eval=0.1 * i,
+        num_topos_eval=1 + i % 4,
+        avg_rfdist_plausible=0.05 * i,
+        num_topos_plausible=1 + i % 2,
+        num_trees_plausible=2,
+        proportion_plausible=0.5,
+        num_topos_search=1 + i % 4,
+        num_topos_parsimony=3,
+        num_taxa=10 + i,
+        num_sites=100 * i + 1,
+        num_patterns=50 * i + 1,
+        column_entropies=[0.1, 0.2 * i],
+        column_entropies_float32=[0.1, 0.2 * i],
+    )
+
+
+@pytest.fixture
+def msa_outdir(tmp_path):
+    outdir = tmp_path / "results"
+    for i in range(7):
+        msa_dir = outdir / f"msa_{i}"
+        msa_dir.mkdir(parents=True)
+        if i % 2:
+            write_parquet_table(Dataset, [_dataset_row(i)], str(msa_dir / "dataset.parquet"))
+        else:
+            db.init(str(msa_dir / "data.sqlite3"))
+            db.connect()
+            db.create_tables([Dataset])
+            Dataset.create(**_dataset_row(i))
+            db.close()
+    # output files of an MSA that did not finish yet
+    (outdir / "msa_unfinished" / "output_files").mkdir(parents=True)
+    return str(outdir)
+
+
+def test_find_msa_databases(msa_outdir):
+    paths = find_msa_databases(msa_outdir)
+
+    assert [os.path.basename(os.path.dirname(p)) for p in paths] == [f"msa_{i}" for i in range(7)]
+    assert all(p.endswith("dataset.parquet" if i % 2 else "data.sqlite3") for i, p in enumerate(paths))
+
+
+@pytest.mark.parametrize("num_workers", [1, 2])
+def test_aggregate_training_data(msa_outdir, tmp_path, num_workers):
+    paths = find_msa_databases(msa_outdir)
+    dataset_dir = str(tmp_path / "training_data.parquet")
+
+    num_rows = aggregate_training_data(paths, dataset_dir, 4, 6, num_workers=num_workers, batch_size=3)
+
+    assert num_rows == 7
+    assert sorted(os.listdir(dataset_dir)) == ["data_type=AA", "data_type=DNA"]
+
+    df = pd.read_parquet(dataset_dir).sort_values("verbose_name").reset_index(drop=True)
+    expected = add_derived_columns(pd.concat([read_dataset_table(p) for p in paths], ignore_index=True), 4, 6)
+
+    assert df.verbose_name.tolist() == expected.verbose_name.tolist()
+    assert df.data_type.astype(str).tolist() == expected.data_type.tolist()
+    for column in ["difficult", "num_topos_eval/num_trees_eval", "num_patterns/num_taxa", "avg_rfdist_eval"]:
+        assert np.allclose(df[column], expected[column])
+    assert df.column_entropies.tolist() == expected.column_entropies.tolist()
+    # packed float32 blobs from SQLite and list<float32> columns from Parquet are both read as arrays
+    for column_entropies, i in zip(df.column_entropies_float32, range(7)):
+        assert np.allclose(column_entropies, [0.1, 0.2 * i])
+
+
+def test_aggregate_training_data_raises_value_error_for_non_empty_dir(msa_outdir):
+    with pytest.raises(ValueError):
+        aggregate_training_data(find_msa_databases(msa_outdir), msa_outdir, 4, 6)
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from fixtures import *
+
+from alignment_store import *
+from msa_features import get_msa_features, read_alignment
+
+
+@pytest.mark.parametrize("msa_file", ["DNA/0.phy", "DNA/0.fasta", "DNA/small.fasta", "AA/0.phy"])
+def test_convert_msa(tmp_path, msa_file):
+    msa_file = os.path.join(os.getcwd(), ".tests/data", msa_file)
+    store_file = str(tmp_path / "alignment.msastore")
+
+    expected = read_alignment(msa_file)
+    assert convert_msa(msa_file, store_file) == expected.sequences.shape
+
+    alignment = read_alignment_store(store_file)
+    assert isinstance(alignment.sequences, np.memmap)
+    assert alignment.taxa == expected.taxa
+    assert alignment.data_type == expected.data_type
+    assert np.array_equal(alignment.sequences, expected.sequences)
+    assert get_msa_features(alignment) == get_msa_features(expected)
+
+
+def test_load_alignment(tmp_path, example_msa_path):
+    store_file = str(tmp_path / "alignment.msastore")
+    convert_msa(example_msa_path, store_file)
+
+    assert is_alignment_store(store_file)
+    assert not is_alignment_store(example_msa_path)
+    assert isinstance(load_alignment(store_file).sequences, np.memmap)
+    assert np.array_equal(load_alignment(store_file).sequences, load_alignment(example_msa_path).sequences)
+
+
+def test_read_alignment_store_raises_value_error(tmp_path, example_msa_path):
+    with pytest.raises(ValueError):
+        read_alignment_store(example_msa_path)
+
+    store_file = tmp_path / "alignment.msastore"
+    convert_msa(example_msa_path, str(store_file))
+    data = bytearray(store_file.read_bytes())
+    data[len(MAGIC)] = FORMAT_VERSION + 1
+    store_file.write_bytes(bytes(data))
+    with pytest.raises(ValueError):
+        read_alignment_store(str(store_file))
@@ -0,0 +1,57 @@
+import json
+
+import numpy as np
+import pytest
+
+from fixtures import *
+
+from column_entropies import *
+from database import *
+
+
+def test_get_column_entropy_summary():
+    column_entropies = [0.0, 0.1, 0.3, 0.6, 0.9, 1.2, 1.8, 2.5, 3.5, 0.0]
+
+    summary = get_column_entropy_summary(column_entropies)
+
+    assert list(summary.keys()) == COLUMN_ENTROPY_SUMMARY_COLUMNS
+    assert summary["column_entropy_min"] == pytest.approx(0.0)
+    assert summary["column_entropy_max"] == pytest.approx(3.5)
+    assert summary["column_entropy_median"] == pytest.approx(np.median(column_entropies))
+    hist = [summary[f"column_entropy_hist_{i}"] for i in range(8)]
+    assert hist == pytest.approx([0.3, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1])
+
+    assert all(value is None for value in get_column_entropy_summary([]).values())
+
+
+def test_float32_array_field_roundtrip(tmp_path):
+    column_entropies = np.random.default_rng(0).random(1000)
+
+    db.init(str(tmp_path / "test.sqlite3"))
+    db.connect()
+    db.create_tables([Dataset])
+    Dataset.create(uuid=f"{0:032x}", column_entropies_float32=column_entropies)
+    dataset = Dataset.get()
+    db.close()
+
+    assert dataset.column_entropies_float32.dtype == np.float32
+    assert np.allclose(dataset.column_entropies_float32, column_entropies)
+
+
+def test_read_column_entropies():
+    values = [0.5, 0.25, 1.0]
+
+    for stored in [np.asarray(values, dtype="<f4").tobytes(), json.dumps(values), values]:
+        column_entropies = read_column_entropies(stored)
+        assert column_entropies.dtype == np.float32
+        assert column_entropies.tolist() == values
+
+    assert read_column_entropies(None) is None
+
+
+def test_column_entropy_summary_features():
+    from features import ADDITIONAL_FEATURES, COLUMN_ENTROPY_SUMMARY_FEATURES
+
+    assert COLUMN_ENTROPY_SUMMARY_FEATURES == COLUMN_ENTROPY_SUMMARY_COLUMNS
+    # the summary columns are not part of the published training data described by the other feature groups
+    assert not set(COLUMN_ENTROPY_SUMMARY_FEATURES) & set(ADDITIONAL_FEATURES)
@@ -0,0 +1,26 @@
+from fixtures import *
+
+from database import *
+
+
+def test_bulk_insert(tmp_path):
+    db.init(str(tmp_path / "test.sqlite3"), pragmas={"journal_mode": "memory", "synchronous": 0})
+    db.connect()
+    db.create_tables([Dataset, ParsimonyTree])
+
+    # more rows than fit into a single INSERT statement
+    num_rows = 2 * SQLITE_MAX_VARIABLES
+    rows = [
+        dict(uuid=f"{i:032x}", dataset_uuid=f"{0:032x}", newick_tree=f"(a,b,c{i});", parsimony_score=i, compute_time=0.5)
+        for i in range(num_rows)
+    ]
+
+    with db.atomic():
+        dataset = Dataset.create(uuid=f"{0:032x}", verbose_name="test")
+        bulk_insert(ParsimonyTree, rows, dataset=dataset)
+
+    assert ParsimonyTree.select().count() == num_rows
+    assert ParsimonyTree.select().where(ParsimonyTree.dataset == dataset).count() == num_rows
+    assert [t.parsimony_score for t in ParsimonyTree.select().order_by(ParsimonyTree.id)] == list(range(num_rows))
+
+    db.close()
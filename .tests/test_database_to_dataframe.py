@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from fixtures import *
+
+from database_to_dataframe import get_difficulty_labels
+
+
+def test_get_difficulty_labels():
+    df = pd.DataFrame(
+        {
+            "avg_rfdist_eval": [0.5, np.nan, 0.2, np.nan],
+            "avg_rfdist_plausible": [0.5, 0.4, -np.inf, np.nan],
+            "num_topos_eval/num_trees_eval": [1.0, 0.6, 0.2, np.inf],
+            "num_topos_plausible/num_trees_plausible": [1.0, 0.2, 0.2, np.nan],
+            "proportion_plausible": [0.0, 1.0, 0.8, None],
+        }
+    )
+
+    labels = get_difficulty_labels(df)
+
+    assert labels[0] == pytest.approx((0.5 + 0.5 + 1.0 + 1.0 + 1.0) / 5)
+    # missing and infinite values are not part of the average
+    assert labels[1] == pytest.approx((0.4 + 0.6 + 0.2 + 0.0) / 4)
+    assert labels[2] == pytest.approx((0.2 + 0.2 + 0.2 + 0.2) / 4)
+    # no finite value
+    assert np.isnan(labels[3])
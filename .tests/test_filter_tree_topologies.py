@@ -56,4 +56,59 @@ def test_filter_tree_topologies_two_trees(newick_tree1, raxmlng_rfdistance_log_i
     assert len(clusters) == 1
     assert all([isinstance(c, set) for c in clusters])
 
-    assert len(clusters[0]) == 1
\ No newline at end of file
+    assert len(clusters[0]) == 1
+
+def test_get_topology_cluster_ids(list_of_many_newick_trees):
+    cluster_ids = get_topology_cluster_ids(list_of_many_newick_trees)
+
+    assert isinstance(cluster_ids, np.ndarray)
+    assert cluster_ids.shape == (len(list_of_many_newick_trees),)
+    assert np.bincount(cluster_ids).tolist() == [7, 52, 13, 2, 8, 4]
+    # cluster IDs are assigned in order of first occurrence
+    assert cluster_ids[0] == 0
+
+
+def test_get_topology_cluster_ids_single_tree(newick_tree1):
+    assert get_topology_cluster_ids([newick_tree1]).tolist() == [0]
+
+
+def test_get_unique_trees(list_of_many_newick_trees):
+    cluster_ids = get_topology_cluster_ids(list_of_many_newick_trees)
+    unique_trees = get_unique_trees(list_of_many_newick_trees, cluster_ids)
+
+    assert len(unique_trees) == 6
+    assert get_topology_cluster_ids(unique_trees).tolist() == list(range(6))
+
+
+def test_filter_tree_topologies_in_process(list_of_many_newick_trees):
+    unique_trees, clusters = filter_tree_topologies(list_of_many_newick_trees)
+
+    assert len(unique_trees) == 6
+    assert all([isinstance(c, set) for c in clusters])
+    assert [len(c) for c in clusters] == [7, 52, 13, 2, 8, 4]
+
+
+def test_write_unique_trees(tmp_path, list_of_many_newick_trees):
+    trees_file = tmp_path / "all.trees"
+    # empty lines are skipped
+    trees_file.write_text("\n".join(list_of_many_newick_trees) + "\n\n")
+    filtered_trees_file = tmp_path / "filtered.trees"
+    clusters_file = tmp_path / "clusters.npy"
+
+    write_unique_trees(str(trees_file), str(filtered_trees_file), str(clusters_file))
+
+    cluster_ids = np.load(clusters_file, allow_pickle=False)
+    assert cluster_ids.tolist() == get_topology_cluster_ids(list_of_many_newick_trees).tolist()
+    assert open(filtered_trees_file).read().split("\n") == get_unique_trees(list_of_many_newick_trees, cluster_ids)
+
+
+def test_get_rfdist_clusters_does_not_evaluate_log_content(tmp_path, list_of_many_newick_trees):
+    log_file = tmp_path / "rfdist.log"
+    log_file.write_text("[0, 1, ]\n[2]\n")
+
+    clusters = get_rfdist_clusters(log_file, list_of_many_newick_trees)
+    assert [len(c) for c in clusters] == [2, 1]
+
+    log_file.write_text("[__import__('os')]\n")
+    with pytest.raises(ValueError):
+        get_rfdist_clusters(log_file, list_of_many_newick_trees)
@@ -0,0 +1,45 @@
+import pytest
+
+from fixtures import *
+
+from iqtree_parser import parse_iqtree_log_record, IQTreeLogRecord
+
+
+def test_parse_iqtree_log_record(iqtree_inference_log):
+    record = parse_iqtree_log_record(iqtree_inference_log)
+
+    assert isinstance(record, IQTreeLogRecord)
+    # first occurrence of the final llh
+    assert record.llh == pytest.approx(-8700.123)
+    assert record.starting_llh == pytest.approx(-8735.928562)
+    assert record.num_iterations == 113
+    assert record.runtime == pytest.approx(32.25)
+    assert record.cpu_time == pytest.approx(63.5)
+    assert record.model == "GTR+G4+FO"
+    # last estimate of the model parameters
+    assert record.rate_het == "Gamma with alpha: 0.75"
+    assert record.base_freq == "A: 0.250  C: 0.250"
+    assert record.subst_rates == "A-C: 1.00  A-G: 2.00"
+    assert record.patterns == 933
+    assert record.gaps == pytest.approx(0.125)
+    assert record.invariant == pytest.approx(0.452)
+
+
+def test_parse_iqtree_log_record_runtime_fallback(tmp_path):
+    log = tmp_path / "search.log"
+    log.write_text("TREE SEARCH COMPLETED AFTER 102 ITERATIONS / Time: 1h:2m:3s\n")
+
+    record = parse_iqtree_log_record(str(log))
+
+    assert record.num_iterations == 102
+    assert record.runtime == pytest.approx(3723.0)
+    assert record.llh is None
+
+
+def test_parse_iqtree_log_record_empty_log(tmp_path):
+    log = tmp_path / "empty.log"
+    log.write_text("")
+
+    record = parse_iqtree_log_record(str(log))
+
+    assert all(value is None for value in record)
@@ -0,0 +1,146 @@
+import multiprocessing
+import os
+import subprocess
+import sys
+
+import pytest
+
+from fixtures import *
+
+from iqtree_parser import parse_iqtree_log_record
+from log_cache import ParsedLogCache
+
+
+def _count_calls(parser):
+    calls = []
+
+    def _parser(log_file):
+        calls.append(log_file)
+        return parser(log_file)
+
+    _parser.__qualname__ = parser.__qualname__
+    _parser.__module__ = parser.__module__
+    return _parser, calls
+
+
+def test_parsed_log_cache_reuses_results(tmp_path, iqtree_inference_log):
+    parser, calls = _count_calls(parse_iqtree_log_record)
+    cache_file = str(tmp_path / "cache.sqlite3")
+
+    with ParsedLogCache(cache_file) as cache:
+        first = cache.parse(parser, iqtree_inference_log)
+        second = cache.parse(parser, iqtree_inference_log)
+
+    # the cache persists across instances
+    with ParsedLogCache(cache_file) as cache:
+        third = cache.parse(parser, iqtree_inference_log)
+
+    assert len(calls) == 1
+    assert first == second == third == parse_iqtree_log_record(iqtree_inference_log)
+    assert type(third) == type(first)
+
+
+def test_parsed_log_cache_invalidates_changed_logs(tmp_path, iqtree_inference_log):
+    parser, calls = _count_calls(parse_iqtree_log_record)
+    log_file = tmp_path / "search.log"
+    log_file.write_text(open(iqtree_inference_log).read())
+
+    with ParsedLogCache(str(tmp_path / "cache.sqlite3")) as cache:
+        record = cache.parse(parser, str(log_file))
+        assert record.runtime == pytest.approx(32.25)
+
+        log_file.write_text("Total wall-clock time used: 1.5 sec (0h:0m:1s)\n")
+        stat = os.stat(log_file)
+        os.utime(log_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        record = cache.parse(parser, str(log_file))
+
+    assert len(calls) == 2
+    assert record.runtime == pytest.approx(1.5)
+    assert record.llh is None
+
+
+@pytest.mark.parametrize("num_workers", [1, 2])
+def test_parsed_log_cache_parse_many(tmp_path, num_workers):
+    log_files = []
+    for i in range(6):
+        log_file = tmp_path / f"search_{i}.log"
+        log_file.write_text(f"Optimal log-likelihood: -{i}.5\nTotal wall-clock time used: {i}.0 sec (0h:0m:{i}s)\n")
+        log_files.append(str(log_file))
+
+    with ParsedLogCache(str(tmp_path / "cache.sqlite3"), num_workers=num_workers) as cache:
+        # partially cached: only the remaining logs are parsed in the pool
+        cache.parse(parse_iqtree_log_record, log_files[2])
+        records = cache.parse_many(parse_iqtree_log_record, log_files)
+
+    assert [r.llh for r in records] == [-(i + 0.5) for i in range(6)]
+    assert [r.runtime for r in records] == [float(i) for i in range(6)]
+    assert records == [parse_iqtree_log_record(f) for f in log_files]
+
+
+@pytest.mark.parametrize("start_method", ["spawn", "forkserver"])
+def test_parsed_log_cache_parse_many_unguarded_script(tmp_path, start_method):
+    if start_method not in multiprocessing.get_all_start_methods():
+        pytest.skip(f"start method {start_method} is not available")
+
+    log_files = []
+    for i in range(4):
+        log_file = tmp_path / f"search_{i}.log"
+        log_file.write_text(f"Optimal log-likelihood: -{i}.5\n")
+        log_files.append(str(log_file))
+
+    # like the snakemake scripts, the script has no __main__ guard
+    script = tmp_path / "script.py"
+    script.write_text(
+        "import multiprocessing\n"
+        "from iqtree_parser import parse_iqtree_log_record\n"
+        "from log_cache import ParsedLogCache\n"
+        f"multiprocessing.set_start_method({start_method!r}, force=True)\n"
+        f"with ParsedLogCache({str(tmp_path / 'cache.sqlite3')!r}, num_workers=2) as cache:\n"
+        f"    records = cache.parse_many(parse_iqtree_log_record, {log_files!r})\n"
+        "print([record.llh for record in records])\n"
+    )
+
+    # the script imports the modules from the same paths as the tests
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    result = subprocess.run([sys.executable, str(script)], capture_output=True, text=True, env=env, timeout=120)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == str([-(i + 0.5) for i in range(4)])
+
+
+def _none_parser(log_file):
+    return None
+
+
+def test_parsed_log_cache_caches_none(tmp_path, iqtree_inference_log):
+    parser, calls = _count_calls(_none_parser)
+    cache_file = str(tmp_path / "cache.sqlite3")
+
+    with ParsedLogCache(cache_file) as cache:
+        assert cache.parse(parser, iqtree_inference_log) is None
+        assert cache.parse_many(parser, [iqtree_inference_log]) == [None]
+
+    assert len(calls) == 1
+
+
+def test_parsed_log_cache_invalidates_changed_helper_modules(tmp_path, monkeypatch, iqtree_inference_log):
+    # the parser module uses a function of a helper module in the same directory
+    (tmp_path / "cache_helper.py").write_text("def get_value():\n    return 1\n")
+    (tmp_path / "cache_parser.py").write_text(
+        "from cache_helper import get_value\n\ndef parse(log_file):\n    return get_value()\n"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    import cache_parser
+
+    cache_file = str(tmp_path / "cache.sqlite3")
+    parser, calls = _count_calls(cache_parser.parse)
+    with ParsedLogCache(cache_file) as cache:
+        cache.parse(parser, iqtree_inference_log)
+    with ParsedLogCache(cache_file) as cache:
+        cache.parse(parser, iqtree_inference_log)
+    assert len(calls) == 1
+
+    (tmp_path / "cache_helper.py").write_text("def get_value():\n    return 2\n")
+    with ParsedLogCache(cache_file) as cache:
+        cache.parse(parser, iqtree_inference_log)
+    assert len(calls) == 2
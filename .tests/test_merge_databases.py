@@ -0,0 +1,65 @@
+import pytest
+
+from fixtures import *
+
+from database import *
+from merge_databases import merge_databases
+
+
+def _create_msa_database(database_file, content_hash, num_trees):
+    db.init(database_file)
+    db.connect()
+    db.create_tables(MODELS)
+    dataset_uuid = content_hash[:32]
+    upsert_dataset(
+        dict(uuid=dataset_uuid, content_hash=content_hash, verbose_name=content_hash[:4], column_entropies=[0.5, 1.0]),
+        {
+            IQTreeTree: [
+                dict(uuid=f"{i:032x}", dataset_uuid=dataset_uuid, starting_type="random", newick_search="(a,b,c);")
+                for i in range(num_trees)
+            ],
+            Taxon: [dict(dataset_uuid=dataset_uuid, index=i, label=label) for i, label in enumerate("abc")],
+        },
+    )
+    db.close()
+    return database_file
+
+
+def test_upsert_dataset(tmp_path):
+    db.init(str(tmp_path / "data.sqlite3"))
+    db.connect()
+    db.create_tables(MODELS)
+
+    row = dict(uuid="a" * 32, content_hash="a" * 64, num_taxa=3)
+    trees = {IQTreeTree: [dict(uuid="b" * 32, dataset_uuid="a" * 32, starting_type="random")]}
+
+    assert upsert_dataset(row, trees) is not None
+    # unchanged dataset is skipped
+    assert upsert_dataset({**row, "num_taxa": 4}, trees) is None
+    assert Dataset.get().num_taxa == 3
+    # replace deletes the old rows of the dataset
+    dataset = upsert_dataset({**row, "num_taxa": 4}, trees, replace=True)
+    assert Dataset.select().count() == 1 and dataset.num_taxa == 4
+    assert IQTreeTree.select().where(IQTreeTree.dataset == dataset).count() == 1
+    assert IQTreeTree.select().count() == 1
+    db.close()
+
+
+def test_merge_databases(tmp_path):
+    store_file = str(tmp_path / "store.sqlite3")
+    first = _create_msa_database(str(tmp_path / "first.sqlite3"), "1" * 64, 3)
+    second = _create_msa_database(str(tmp_path / "second.sqlite3"), "2" * 64, 2)
+
+    assert merge_databases(store_file, [first]) == (1, 0)
+    # the first dataset is unchanged and skipped, only the second one is inserted
+    assert merge_databases(store_file, [first, second]) == (1, 1)
+
+    db.init(store_file)
+    db.connect()
+    assert Dataset.select().count() == 2
+    dataset = Dataset.get(Dataset.content_hash == "2" * 64)
+    assert dataset.column_entropies == [0.5, 1.0]
+    assert IQTreeTree.select().where(IQTreeTree.dataset == dataset).count() == 2
+    assert IQTreeTree.select().count() == 5
+    assert dataset.get_taxa() == ["a", "b", "c"]
+    db.close()
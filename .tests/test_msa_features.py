@@ -1,38 +1,222 @@
+import math
+from collections import Counter
+
+import numpy as np
+import pytest
+
 from fixtures import *
 
+from msa_features import *
+from msa_sniffer import sniff_msa
+
+
+def _msa_file(name):
+    return os.path.join(os.getcwd(), ".tests/data", name)
+
+
+def _reference_column_entropies(alignment):
+    # per site computation as in pypythia
+    entropies = []
+    for site in alignment.sequences.T:
+        counter = Counter(site.tobytes())
+        counter.pop(GAP, None)
+        counts = np.array(list(counter.values()))
+        probabilities = counts / np.sum(counts)
+        entropies.append(-np.sum(probabilities * np.log2(probabilities)))
+    return entropies
+
+
+def _reference_bollback(alignment):
+    pattern_counts = Counter(site.tobytes() for site in alignment.sequences.T)
+    num_sites = alignment.sequences.shape[1]
+    return sum(n * math.log(n) for n in pattern_counts.values()) - num_sites * math.log(num_sites)
+
+
+@pytest.mark.parametrize("msa_file", ["DNA/0.phy", "DNA/0.fasta", "DNA/small.fasta", "AA/0.phy", "AA/3.phy"])
+def test_get_msa_features(msa_file):
+    alignment = read_alignment(_msa_file(msa_file))
+    features = get_msa_features(alignment)
+
+    assert (features["taxa"], features["sites"]) == alignment.sequences.shape
+    assert features["column_entropies"] == pytest.approx(_reference_column_entropies(alignment))
+    assert features["entropy"] == pytest.approx(np.mean(_reference_column_entropies(alignment)))
+    assert features["bollback"] == pytest.approx(_reference_bollback(alignment))
+    assert 0 <= features["gaps"] <= 1
+    assert 0 <= features["invariant"] <= 1
+
+
+def test_read_alignment_phylip_interleaved():
+    alignment = read_alignment(_msa_file("DNA/0.phy"))
+
+    assert alignment.data_type == "DNA"
+    assert alignment.sequences.shape == (68, 766)
+    assert alignment.taxa[0] == "Colletotrichum_acutatum_67_JN121275"
+    assert alignment.sequences[0, :13].tobytes() == b"----------GTC"
+    assert read_alignment(_msa_file("AA/0.phy")).data_type == "AA"
+
+
+def test_guess_msa_file_data_type():
+    cwd = os.getcwd()
+    for true_type in ["DNA", "AA"]:
+        base_dir = f"{cwd}/.tests/data/{true_type}/"
+        for msa_file in os.listdir(base_dir):
+            msa_file = base_dir + msa_file
+            assert read_alignment(msa_file).data_type == true_type
+            assert sniff_msa(msa_file).data_type == true_type
+
+
+def test_read_alignment_normalizes_characters(tmp_path):
+    msa_file = tmp_path / "msa.fasta"
+    msa_file.write_text(">t1\nacgtN?\n>t2\nACG.RX\n")
+    alignment = read_alignment(str(msa_file))
+
+    assert alignment.taxa == ["t1", "t2"]
+    assert alignment.sequences.tobytes() == b"ACGT--" + b"ACG-R-"
+
+
+def test_read_alignment_dna_u_is_t(tmp_path):
+    msa_file = tmp_path / "msa.fasta"
+    msa_file.write_text(">t1\nTA\n>t2\nUA\n>t3\ntC\n>t4\nuC\n")
+    alignment = read_alignment(str(msa_file))
+    features = get_msa_features(alignment)
+
+    assert alignment.sequences[:, 0].tobytes() == b"TTTT"
+    assert features["column_entropies"] == pytest.approx([0.0, 1.0])
+    assert features["patterns"] == 2
+    assert features["bollback"] == pytest.approx(_reference_bollback(alignment))
+
+
+def test_read_alignment_raises_value_error(tmp_path):
+    msa_file = tmp_path / "msa.fasta"
+    msa_file.write_text(">t1\nACGT\n>t2\nACG\n")
+    with pytest.raises(ValueError):
+        read_alignment(str(msa_file))
+
+
+@pytest.mark.parametrize(
+    "msa_file, expected",
+    [
+        # values reported by RAxML-NG (as computed by pypythia)
+        ("DNA/0.phy", (241, 0.07886653355859315, 0.597911227154047)),
+        ("DNA/small.fasta", (4, 0.0, 1.0)),
+        ("AA/0.phy", (387, 0.06817256817256817, 0.24358974358974358)),
+    ],
+)
+def test_get_patterns_gaps_invariant_raxmlng(msa_file, expected):
+    patterns, gaps, invariant = get_patterns_gaps_invariant(read_alignment(_msa_file(msa_file)), "raxml-ng")
+    assert patterns == expected[0]
+    assert (gaps, invariant) == pytest.approx(expected[1:])
+
+
+def test_get_patterns_gaps_invariant(tmp_path):
+    msa_file = tmp_path / "msa.fasta"
+    # sites: constant, constant with ambiguity, variable, constant with gap, full gap, TUT and TTT (the same pattern)
+    msa_file.write_text(">t1\nAA-A-TT\n>t2\nARCA-UT\n>t3\nAAG--TT\n")
+    alignment = read_alignment(str(msa_file))
+
+    # full gap sites are a pattern and constant in IQ-Tree, R is an ambiguous character
+    assert get_patterns_gaps_invariant(alignment, "iqtree") == (6, pytest.approx(6 / 21), pytest.approx(6 / 7))
+    assert get_patterns_gaps_invariant(alignment, "raxml-ng") == (5, pytest.approx(2 / 18), pytest.approx(5 / 6))
+
+    with pytest.raises(ValueError):
+        get_patterns_gaps_invariant(alignment, "phyml")
+
+
+def test_get_msa_features_given_patterns_gaps_invariant(monkeypatch):
+    import msa_features
+
+    def _fail(*args, **kwargs):
+        raise AssertionError("get_patterns_gaps_invariant must not be called")
+
+    alignment = read_alignment(_msa_file("DNA/small.fasta"))
+    monkeypatch.setattr(msa_features, "get_patterns_gaps_invariant", _fail)
+    features = get_msa_features(alignment, "raxml-ng", (7, 0.5, 0.25))
+
+    assert (features["patterns"], features["gaps"], features["invariant"]) == (7, 0.5, 0.25)
+
+
+def test_get_pattern_counts(tmp_path):
+    msa_file = tmp_path / "msa.fasta"
+    msa_file.write_text(">t1\nAAUTC\n>t2\nCCTTC\n")
+    alignment = read_alignment(str(msa_file))
+    pattern_counts = get_pattern_counts(alignment.sequences)
+
+    # AC twice, TT twice (U is T), CC once
+    assert sorted(pattern_counts.tolist()) == [1, 2, 2]
+    assert get_bollback_multinomial(pattern_counts) == pytest.approx(_reference_bollback(alignment))
+    assert get_msa_features(alignment)["patterns"] == len(pattern_counts)
+
+
+def test_get_pattern_counts_blocks():
+    sequences = read_alignment(_msa_file("DNA/0.phy")).sequences
+    expected = Counter(site.tobytes() for site in sequences.T)
+
+    # blocks of 3 sites, the counts of patterns occurring in several blocks are merged
+    pattern_counts = get_pattern_counts(sequences, block_entries=3 * sequences.shape[0])
+    assert sorted(pattern_counts.tolist()) == sorted(expected.values())
+
+
+def test_get_char_frequencies(tmp_path):
+    msa_file = tmp_path / "msa.fasta"
+    msa_file.write_text(">t1\nAAC-\n>t2\nAGTN\n")
+    alignment = read_alignment(str(msa_file))
+
+    # gaps (- and N) are ignored
+    expected = {"A": 3 / 6, "C": 1 / 6, "G": 1 / 6, "T": 1 / 6}
+    assert get_char_frequencies(*get_state_counts(alignment.sequences)) == pytest.approx(expected)
+    assert get_msa_features(alignment)["char_frequencies"] == pytest.approx(expected)
+
+
+def test_invariant_morph(tmp_path):
+    msa_file = tmp_path / "msa.phy"
+    msa_file.write_text("3 3\nt1 01?\nt2 0-2\nt3 013\n")
+    features = get_msa_features(read_alignment(str(msa_file)))
+
+    assert features["patterns"] == 3
+    assert features["invariant"] == pytest.approx(2 / 3)
+    assert features["gaps"] == pytest.approx(2 / 9)
+
+
+def test_get_pairwise_distances():
+    from Bio.Align import MultipleSeqAlignment
+    from Bio.Phylo.TreeConstruction import DistanceCalculator
+    from Bio.Seq import Seq
+    from Bio.SeqRecord import SeqRecord
+
+    alignment = read_alignment(_msa_file("AA/0.phy"))
+    records = [SeqRecord(Seq(seq.tobytes().decode()), id=taxon) for taxon, seq in zip(alignment.taxa, alignment.sequences)]
+    expected = DistanceCalculator("identity").get_distance(MultipleSeqAlignment(records))
 
-class TestMSAFeatures:
-    def test_get_msa_file_format(self, dna_phylip_msa, dna_fasta_msa):
-        ff = dna_phylip_msa._get_file_format()
-        assert ff == "phylip-relaxed"
+    # small blocks to test the blocked computation
+    distances = get_pairwise_distances(alignment.sequences, block_entries=1000)
+    num_taxa = len(alignment.taxa)
+    assert distances == pytest.approx(np.array([[expected[i, j] for j in range(num_taxa)] for i in range(num_taxa)]))
 
-        ff = dna_fasta_msa._get_file_format()
-        assert ff == "fasta"
 
-    def test_guess_msa_file_data_type(self):
-        cwd = os.getcwd()
-        for true_type in ["DNA", "AA"]:
-            base_dir = f"{cwd}/.tests/data/{true_type}/"
-            for msa_file in os.listdir(base_dir):
-                msa_file = base_dir + msa_file
-                msa = MSA(msa_file)
-                guessed_type = msa.guess_data_type()
-                assert guessed_type == true_type
+def test_get_treelikeness_score():
+    # distances of the tree ((0,1),(2,3)) with unit branch lengths are additive, so all quartets have delta 0
+    tree_distances = np.array([[0, 2, 3, 3], [2, 0, 3, 3], [3, 3, 0, 2], [3, 3, 2, 0]], dtype=float)
+    assert get_treelikeness_score(tree_distances) == 0
+    # sums of distances 2, 4 and 3 for the three splits: (4 - 3) / (4 - 2)
+    conflicting_distances = np.array([[0, 1, 2, 1.5], [1, 0, 1.5, 2], [2, 1.5, 0, 1], [1.5, 2, 1, 0]], dtype=float)
+    assert get_treelikeness_score(conflicting_distances) == pytest.approx(0.5)
+    assert get_treelikeness_score(np.zeros((3, 3))) is None
 
-    def test_number_of_taxa(self, dna_phylip_msa):
-        assert dna_phylip_msa.number_of_taxa() == 68
 
-    def test_number_of_sites(self, dna_phylip_msa):
-        assert dna_phylip_msa.number_of_sites() == 766
+def test_get_treelikeness_score_sampled_quartets():
+    rng = np.random.default_rng(1)
+    distances = rng.random((30, 30))
+    distances = distances + distances.T
 
-    def test_get_avg_entropy(self, small_msa):
-        # TODO
-        pass
+    # 27405 quartets in total
+    exact = get_treelikeness_score(distances, num_quartets=10**6)
+    sampled = get_treelikeness_score(distances, num_quartets=5000)
+    assert sampled == get_treelikeness_score(distances, num_quartets=5000)
+    assert sampled == pytest.approx(exact, abs=0.02)
 
-    def test_bollback_multinomial(self, small_msa):
-        # TODO
-        pass
 
-    def test_treelikeness_score(self, small_msa):
-        # TODO
-        pass
+def test_treelikeness_morph(tmp_path):
+    msa_file = tmp_path / "msa.phy"
+    msa_file.write_text("5 6\nt1 000111\nt2 001111\nt3 110001\nt4 110000\nt5 11-0?0\n")
+    features = get_msa_features(read_alignment(str(msa_file)))
+    assert 0 <= features["treelikeness"] <= 1
@@ -0,0 +1,62 @@
+import pytest
+
+from fixtures import *
+
+from msa_sniffer import *
+
+
+@pytest.mark.parametrize(
+    "msa_file, data_type, raxmlng_model",
+    [
+        ("DNA/0.phy", "DNA", "GTR+G"),
+        ("DNA/0.fasta", "DNA", "GTR+G"),
+        ("DNA/small.fasta", "DNA", "GTR+G"),
+        ("AA/0.phy", "AA", "LG+G"),
+    ],
+)
+def test_sniff_msa(msa_file, data_type, raxmlng_model):
+    msa_file = os.path.join(os.getcwd(), ".tests/data", msa_file)
+    assert sniff_msa(msa_file) == (data_type, raxmlng_model)
+    # the sample gives the same result as reading all sequences
+    assert sniff_msa(msa_file, num_sequences=2) == sniff_msa(msa_file, num_sequences=10**9)
+
+
+def test_sniff_msa_morph(tmp_path):
+    msa_file = tmp_path / "morph.phy"
+    # the largest state only occurs in the last sequence
+    msa_file.write_text("3 4\nt1 01?-\nt2 0110\nt3 012A\n")
+    assert sniff_msa(str(msa_file), num_sequences=1) == ("MORPH", "MULTI11_GTR")
+
+
+def test_sniff_msa_raises_value_error(tmp_path):
+    msa_file = tmp_path / "invalid.phy"
+    msa_file.write_text("this is not an MSA\n")
+    with pytest.raises(ValueError):
+        sniff_msa(str(msa_file))
+
+    msa_file.write_text(">t1\nAC$T\n")
+    with pytest.raises(ValueError):
+        sniff_msa(str(msa_file))
+
+
+def test_msa_manifest(tmp_path, example_msa_path, monkeypatch):
+    manifest_file = str(tmp_path / "manifest.json")
+    copied_msa = tmp_path / "copy.phy"
+    copied_msa.write_bytes(open(example_msa_path, "rb").read())
+
+    with MSAManifest(manifest_file) as manifest:
+        assert manifest.get(example_msa_path) == ("DNA", "GTR+G")
+
+    def _sniff_msa(*args, **kwargs):
+        raise AssertionError("The MSA was sniffed again.")
+
+    monkeypatch.setattr(sys.modules["msa_sniffer"], "sniff_msa", _sniff_msa)
+    # unchanged files and files with the same content are taken from the manifest
+    with MSAManifest(manifest_file) as manifest:
+        assert manifest.get(example_msa_path) == ("DNA", "GTR+G")
+        assert manifest.get(str(copied_msa)) == ("DNA", "GTR+G")
+
+    copied_msa.write_text(">t1\nACDE\n")
+    with MSAManifest(manifest_file) as manifest:
+        with pytest.raises(AssertionError):
+            manifest.get(str(copied_msa))
@@ -0,0 +1,45 @@
+import pytest
+
+from fixtures import *
+
+from database import *
+from newick_compression import *
+
+
+def test_get_newick_dictionary():
+    dictionary = get_newick_dictionary(["((A:0.1,B:0.2):0.3,'C D':0.4,E);", "(A,(B,E),'C D');"])
+
+    assert dictionary == b"'C D',A,B,E"
+
+
+def test_compress_newick(list_of_many_newick_trees):
+    dictionary = get_newick_dictionary(list_of_many_newick_trees[:1])
+
+    for newick in list_of_many_newick_trees:
+        data = compress_newick(newick, dictionary)
+        assert len(data) < len(newick)
+        assert decompress_newick(data, dictionary) == newick
+
+    newick = list_of_many_newick_trees[0]
+    assert decompress_newick(compress_newick(newick)) == newick
+
+
+def test_get_newick(tmp_path, list_of_many_newick_trees):
+    newick = list_of_many_newick_trees[0]
+    dictionary = get_newick_dictionary([newick])
+
+    db.init(str(tmp_path / "test.sqlite3"))
+    db.connect()
+    db.create_tables([Dataset, ParsimonyTree])
+    dataset = Dataset.create(
+        uuid=f"{0:032x}", newick_final_zlib=compress_newick(newick, dictionary), newick_dictionary=dictionary
+    )
+    ParsimonyTree.create(
+        uuid=f"{1:032x}", dataset=dataset, dataset_uuid=dataset.uuid, newick_tree_zlib=compress_newick(newick, dictionary)
+    )
+    ParsimonyTree.create(uuid=f"{2:032x}", dataset=dataset, dataset_uuid=dataset.uuid, newick_tree=newick)
+
+    assert Dataset.get().newick_final is None
+    assert Dataset.get().get_newick("newick_final") == newick
+    assert [tree.get_newick("newick_tree") for tree in ParsimonyTree.select()] == [newick, newick]
+    db.close()
@@ -0,0 +1,48 @@
+import sqlite3
+
+import pandas as pd
+
+from fixtures import *
+
+from database import *
+from parquet_writer import get_arrow_schema, write_parquet_table
+
+
+def test_get_arrow_schema():
+    for model in [Dataset, IQTreeTree, ParsimonyTree]:
+        schema = get_arrow_schema(model)
+        assert schema.names == [field.column_name for field in model._meta.sorted_fields]
+
+    schema = get_arrow_schema(IQTreeTree)
+    assert str(schema.field("dataset_id").type) == "int64"
+    assert str(schema.field("plausible").type) == "bool"
+    assert str(schema.field("uuid").type) == "string"
+
+
+def test_write_parquet_table_matches_sqlite(tmp_path):
+    dataset_row = dict(uuid=f"{0:032x}", verbose_name="test", num_taxa=5, column_entropies=[0.5, 0.25], entropy=None)
+    rows = [
+        dict(uuid=f"{i + 1:032x}", dataset_uuid=f"{0:032x}", newick_tree=f"(a,b,c{i});", parsimony_score=i, compute_time=0.5)
+        for i in range(10)
+    ]
+
+    db.init(str(tmp_path / "test.sqlite3"))
+    db.connect()
+    db.create_tables([Dataset, ParsimonyTree])
+    with db.atomic():
+        dataset = Dataset.create(**dataset_row)
+        bulk_insert(ParsimonyTree, rows, dataset=dataset)
+    db.close()
+
+    write_parquet_table(Dataset, [dataset_row], str(tmp_path / "dataset.parquet"))
+    write_parquet_table(ParsimonyTree, rows, str(tmp_path / "parsimony_trees.parquet"), dataset=1)
+
+    con = sqlite3.connect(str(tmp_path / "test.sqlite3"))
+    for table, parquet_file in [("dataset", "dataset.parquet"), ("parsimonytree", "parsimony_trees.parquet")]:
+        df_sqlite = pd.read_sql_query(f"SELECT * FROM {table}", con)
+        df_parquet = pd.read_parquet(str(tmp_path / parquet_file))
+        # missing values are None in object columns read from SQLite and NaN in the typed Parquet columns
+        assert df_sqlite.columns.tolist() == df_parquet.columns.tolist()
+        assert df_sqlite.astype(object).where(df_sqlite.notna(), None).values.tolist() == \
+            df_parquet.astype(object).where(df_parquet.notna(), None).values.tolist()
+    con.close()
@@ -0,0 +1,89 @@
+import sqlite3
+
+import pytest
+
+from fixtures import *
+
+from database import *
+from queries import *
+
+
+@pytest.fixture
+def tree_database(tmp_path):
+    database_file = str(tmp_path / "data.sqlite3")
+    db.init(database_file)
+    db.connect()
+    db.create_tables(MODELS)
+    for d in range(3):
+        dataset = Dataset.create(uuid=f"{d:032x}", data_type="DNA" if d else "AA")
+        rows = [
+            dict(
+                uuid=f"{d:016x}{i:016x}",
+                dataset_uuid=dataset.uuid,
+                starting_type="parsimony",
+                plausible=i % 3 == 0,
+                cluster_id=i % 4,
+            )
+            for i in range(20)
+        ]
+        bulk_insert(IQTreeTree, rows, dataset=dataset)
+        bulk_insert(Taxon, [dict(dataset_uuid=dataset.uuid, index=i, label=f"t{i}") for i in [2, 0, 1]], dataset=dataset)
+    yield database_file
+    db.close()
+
+
+def test_queries(tree_database):
+    dataset_uuid = f"{1:032x}"
+
+    assert get_datasets("DNA").count() == 2
+    assert get_dataset(dataset_uuid).data_type == "DNA"
+    assert get_plausible_trees(dataset_uuid).count() == 7
+    assert all(tree.cluster_id == 2 for tree in get_cluster_trees(dataset_uuid, 2))
+    assert get_cluster_sizes(dataset_uuid) == {0: 5, 1: 5, 2: 5, 3: 5}
+    assert get_num_plausible_trees() == {f"{d:032x}": 7 for d in range(3)}
+    assert get_taxa(dataset_uuid) == ["t0", "t1", "t2"]
+
+
+def test_queries_use_indexes(tree_database):
+    dataset_uuid = f"{1:032x}"
+
+    for query in [
+        get_plausible_trees(dataset_uuid),
+        get_cluster_trees(dataset_uuid, 1),
+        get_parsimony_trees(dataset_uuid),
+        get_datasets("DNA"),
+    ]:
+        plan = " ".join(get_query_plan(query))
+        assert "USING INDEX" in plan or "USING COVERING INDEX" in plan, plan
+
+
+def test_migrate_database(tmp_path):
+    database_file = str(tmp_path / "old.sqlite3")
+    # database with an older schema without indexes and without the newer columns
+    con = sqlite3.connect(database_file)
+    con.execute("CREATE TABLE dataset (id INTEGER NOT NULL PRIMARY KEY, uuid VARCHAR(40) NOT NULL, data_type TEXT)")
+    con.execute(
+        "CREATE TABLE iqtreetree (id INTEGER NOT NULL PRIMARY KEY, uuid VARCHAR(40) NOT NULL, dataset_id INTEGER NOT NULL, "
+        "dataset_uuid VARCHAR(40) NOT NULL, starting_type VARCHAR(255) NOT NULL, plausible INTEGER, cluster_id INTEGER)"
+    )
+    con.execute("INSERT INTO dataset VALUES (1, ?, 'DNA')", (f"{0:032x}",))
+    con.execute("INSERT INTO iqtreetree VALUES (1, ?, 1, ?, 'random', 1, 0)", (f"{1:032x}", f"{0:032x}"))
+    con.commit()
+    con.close()
+
+    added = migrate_database(database_file)
+
+    assert "dataset.column_entropies_float32" in added
+    assert "iqtreetree.newick_search_zlib" in added
+
+    db.init(database_file)
+    db.connect()
+    assert db.table_exists("taxon")
+    assert {"iqtreetree_dataset_uuid_plausible", "iqtreetree_dataset_uuid_cluster_id"} <= {
+        index.name for index in db.get_indexes("iqtreetree")
+    }
+    assert get_plausible_trees(f"{0:032x}").count() == 1
+    db.close()
+
+    # migrating twice does not change anything
+    assert migrate_database(database_file) == []
@@ -0,0 +1,123 @@
+from fixtures import *
+
+from tempfile import TemporaryDirectory
+
+from pypythia.raxmlng_parser import get_raxmlng_rfdist_results
+from rfdistance import *
+
+
+@pytest.fixture
+def many_trees_path():
+    cwd = os.getcwd()
+    return f"{cwd}/.tests/data/trees/many.trees"
+
+
+@pytest.fixture
+def raxmlng_rfdistances_many_trees():
+    cwd = os.getcwd()
+    return f"{cwd}/.tests/data/logs/raxml.many.rfdistances"
+
+
+def test_get_splits_for_tree_is_independent_of_rooting_and_order():
+    taxon_index = {}
+    splits = get_splits_for_tree("((A:0.1,B:0.2):0.3,C:0.4,(D:0.5,E:0.6):0.7);", taxon_index)
+    rerooted = get_splits_for_tree("(((E,D),C),B,A);", taxon_index)
+
+    assert len(taxon_index) == 5
+    assert len(splits) == 2
+    assert splits == rerooted
+
+
+def test_get_splits_for_tree_raises_value_error_for_different_taxa():
+    taxon_index = {}
+    get_splits_for_tree("((A,B),C,(D,E));", taxon_index)
+
+    with pytest.raises(ValueError):
+        get_splits_for_tree("((A,B),C,(D,F));", taxon_index)
+
+    with pytest.raises(ValueError):
+        get_splits_for_tree("((A,B),C,D);", taxon_index)
+
+
+def test_get_rfdistance_matrix_matches_raxmlng(list_of_many_newick_trees, raxmlng_rfdistances_many_trees):
+    taxa, splits = get_splits_for_trees(list_of_many_newick_trees)
+    rfdistances = get_rfdistance_matrix(splits)
+
+    assert rfdistances.shape == (86, 86)
+    assert np.all(rfdistances == rfdistances.T)
+
+    for line in open(raxmlng_rfdistances_many_trees):
+        i, j, abs_rfdist, _ = line.split()
+        assert rfdistances[int(i), int(j)] == int(abs_rfdist)
+
+
+def test_get_split_matrix(list_of_many_newick_trees):
+    taxa, splits = get_splits_for_trees(list_of_many_newick_trees)
+    split_words, tree_splits = get_split_matrix(splits)
+    num_unique_splits = len(set().union(*splits))
+
+    assert split_words.dtype == np.uint64
+    assert split_words.shape == (num_unique_splits, 2)
+    assert tree_splits.dtype == np.uint64
+    assert tree_splits.shape == (86, (num_unique_splits + 63) // 64)
+
+    # row i of tree_splits encodes exactly the splits of tree i
+    for i, tree_splits_row in enumerate(tree_splits):
+        bits = np.unpackbits(tree_splits_row.view(np.uint8), bitorder="little")
+        decoded = {
+            sum(int(word) << (64 * k) for k, word in enumerate(split_words[idx]))
+            for idx in np.flatnonzero(bits)
+        }
+        assert decoded == set(splits[i])
+
+
+def test_get_rfdistance_matrix_is_independent_of_block_size(list_of_many_newick_trees):
+    _, splits = get_splits_for_trees(list_of_many_newick_trees)
+
+    assert np.all(get_rfdistance_matrix(splits) == get_rfdistance_matrix(splits, max_block_words=1))
+
+
+def test_get_topology_clusters(list_of_many_newick_trees):
+    _, splits = get_splits_for_trees(list_of_many_newick_trees)
+    clusters = get_topology_clusters(splits)
+
+    assert [len(c) for c in clusters] == [7, 52, 13, 2, 8, 4]
+
+
+def test_get_rfdistance_results_for_file(many_trees_path):
+    num_topos, rel_rfdist, abs_rfdist = get_rfdistance_results_for_file(many_trees_path)
+
+    assert num_topos == 6
+    assert abs_rfdist == pytest.approx(22.2687, abs=1e-4)
+    assert rel_rfdist == pytest.approx(0.113616, abs=1e-6)
+
+
+def test_get_rfdistance_results_identical_trees(newick_tree1):
+    assert get_rfdistance_results([newick_tree1, newick_tree1]) == (1, 0.0, 0.0)
+
+
+def test_get_rfdistance_results_single_tree(newick_tree1):
+    assert get_rfdistance_results([newick_tree1]) == (1, 0.0, 0.0)
+
+
+def test_write_rfdistance_files(many_trees_path, raxmlng_rfdistances_many_trees):
+    with TemporaryDirectory() as tmpdir:
+        rfdist_file = os.path.join(tmpdir, "rfDistances")
+        log_file = os.path.join(tmpdir, "rfDistances.log")
+        write_rfdistance_files(many_trees_path, rfdist_file, log_file)
+
+        assert open(rfdist_file).read() == open(raxmlng_rfdistances_many_trees).read()
+
+        num_topos, rel_rfdist, abs_rfdist = get_raxmlng_rfdist_results(log_file)
+        assert num_topos == 6
+        assert abs_rfdist == pytest.approx(22.2687, abs=1e-4)
+
+
+def test_write_rfdistance_files_rounds_relative_distances(tmp_path):
+    # 6 taxa, maximum RF-Distance 6: 4 / 6 is written as 0.666667 (older RAxML-NG versions truncate to 0.666666)
+    trees_file = tmp_path / "trees"
+    trees_file.write_text("((A,B),C,((D,E),F));\n((A,B),D,((C,E),F));\n")
+    rfdist_file = str(tmp_path / "rfDistances")
+    write_rfdistance_files(str(trees_file), rfdist_file, str(tmp_path / "rfDistances.log"))
+
+    assert open(rfdist_file).read() == "0\t1\t4\t0.666667\n"
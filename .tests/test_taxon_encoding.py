@@ -0,0 +1,53 @@
+import pytest
+
+from fixtures import *
+
+from database import *
+from newick_compression import compress_newick, get_newick_dictionary
+from taxon_encoding import *
+
+
+def test_get_taxa():
+    assert get_taxa("((A:0.1,'B C':0.2)0.9:0.3,D,[comment]E);") == ["A", "B C", "D", "E"]
+
+
+def test_encode_decode_taxa(list_of_many_newick_trees):
+    taxa = get_taxa(list_of_many_newick_trees[0])
+    taxon_index = dict(zip(taxa, range(len(taxa))))
+
+    for newick in list_of_many_newick_trees:
+        encoded = encode_taxa(newick, taxon_index)
+        assert len(encoded) < len(newick)
+        assert decode_taxa(encoded, taxa) == newick
+
+
+def test_encode_taxa_keeps_topology():
+    newick = "((A:0.1,'B C':0.2)0.9:0.3,D,E);"
+    taxa = get_taxa(newick)
+
+    encoded = encode_taxa(newick, dict(zip(taxa, range(len(taxa)))))
+
+    assert encoded == "((0:0.1,1:0.2)0.9:0.3,2,3);"
+    assert decode_taxa(encoded, taxa) == newick
+
+
+def test_encode_taxa_raises_value_error_for_unknown_taxon():
+    with pytest.raises(ValueError):
+        encode_taxa("(A,B,C);", {"A": 0, "B": 1})
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_get_newick_with_encoded_taxa(tmp_path, newick_tree1, compress):
+    taxa = get_taxa(newick_tree1)
+    encoded = encode_taxa(newick_tree1, dict(zip(taxa, range(len(taxa)))))
+    dictionary = get_newick_dictionary([encoded]) if compress else None
+    stored = dict(newick_final_zlib=compress_newick(encoded, dictionary)) if compress else dict(newick_final=encoded)
+
+    db.init(str(tmp_path / "test.sqlite3"))
+    db.connect()
+    db.create_tables([Dataset, Taxon])
+    dataset = Dataset.create(uuid=f"{0:032x}", taxa_encoded=True, newick_dictionary=dictionary, **stored)
+    bulk_insert(Taxon, [dict(dataset_uuid=dataset.uuid, index=i, label=t) for i, t in enumerate(taxa)], dataset=dataset)
+
+    assert Dataset.get().get_newick("newick_final") == newick_tree1
+    db.close()
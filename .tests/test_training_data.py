@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from fixtures import *
+
+from aggregate_training_data import aggregate_training_data, find_msa_databases
+from database import *
+from features import FINAL_FEATURES, LABEL
+from msa_features import get_msa_features, read_alignment
+from parquet_writer import write_parquet_table
+from training_data import FEATURE_GROUPS, get_feature_columns, load_training_data
+
+
+@pytest.fixture
+def training_data(tmp_path):
+    num_rows = 10
+    df = pd.DataFrame({col: np.arange(num_rows, dtype=float) for col in FINAL_FEATURES})
+    df["data_type"] = ["DNA", "AA"] * (num_rows // 2)
+    df["newick_final"] = ["(a,b,c);"] * num_rows
+    df["column_entropies"] = ["[0.1,0.2]"] * num_rows
+    df[LABEL] = np.linspace(0, 1, num_rows)
+
+    path = str(tmp_path / "training_data.parquet")
+    df.to_parquet(path)
+    dataset_dir = str(tmp_path / "training_data_dataset")
+    pq.write_to_dataset(pa.Table.from_pandas(df), dataset_dir, partition_cols=["data_type"])
+    return path, dataset_dir, df
+
+
+def test_get_feature_columns():
+    assert get_feature_columns("FINAL_FEATURES") == FINAL_FEATURES + [LABEL]
+    assert get_feature_columns(["entropy", "entropy"], include_label=False) == ["entropy"]
+
+    with pytest.raises(ValueError):
+        get_feature_columns("bananas")
+
+
+def test_load_training_data(training_data):
+    path, dataset_dir, df = training_data
+
+    for data in [path, dataset_dir]:
+        loaded = load_training_data(data, "FINAL_FEATURES", filters=[("data_type", "==", "DNA")])
+
+        assert loaded.columns.tolist() == FINAL_FEATURES + [LABEL]
+        assert loaded[LABEL].tolist() == df[df.data_type == "DNA"][LABEL].tolist()
+
+
+def test_load_training_data_raises_value_error_for_missing_columns(training_data):
+    path, _, _ = training_data
+
+    with pytest.raises(ValueError):
+        load_training_data(path, "ALL_FEATURES")
+
+
+@pytest.fixture
+def aggregated_training_data(tmp_path):
+    # dataset tables as written by save_data with both backends, the MSA features are computed on a real MSA
+    msa_features = get_msa_features(read_alignment(os.path.join(os.getcwd(), ".tests/data/DNA/0.phy")))
+    row = dict(
+        data_type="DNA",
+        num_searches=4,
+        avg_rfdist_eval=0.2,
+        num_topos_eval=2,
+        avg_rfdist_plausible=0.1,
+        num_topos_plausible=1,
+        num_trees_plausible=2,
+        proportion_plausible=0.5,
+        num_topos_search=2,
+        num_topos_parsimony=3,
+        avg_rfdist_parsimony=0.3,
+        num_taxa=msa_features["taxa"],
+        num_sites=msa_features["sites"],
+        num_patterns=msa_features["patterns"],
+        proportion_gaps=msa_features["gaps"],
+        proportion_invariant=msa_features["invariant"],
+        entropy=msa_features["entropy"],
+        column_entropies=msa_features["column_entropies"],
+        bollback=msa_features["bollback"],
+        treelikeness=msa_features["treelikeness"],
+        char_frequencies=msa_features["char_frequencies"],
+    )
+    outdir = tmp_path / "results"
+    for i in range(2):
+        msa_dir = outdir / f"msa_{i}"
+        msa_dir.mkdir(parents=True)
+        dataset_row = dict(row, uuid=f"{i:032x}", verbose_name=f"msa_{i}")
+        if i:
+            write_parquet_table(Dataset, [dataset_row], str(msa_dir / "dataset.parquet"))
+        else:
+            db.init(str(msa_dir / "data.sqlite3"))
+            db.connect()
+            db.create_tables([Dataset])
+            Dataset.create(**dataset_row)
+            db.close()
+
+    dataset_dir = str(tmp_path / "training_data.parquet")
+    aggregate_training_data(find_msa_databases(str(outdir)), dataset_dir, 4, 6)
+    return dataset_dir, msa_features
+
+
+@pytest.mark.parametrize("features", FEATURE_GROUPS)
+def test_load_training_data_aggregated(aggregated_training_data, features):
+    dataset_dir, msa_features = aggregated_training_data
+    loaded = load_training_data(dataset_dir, features)
+
+    assert loaded.columns.tolist() == get_feature_columns(features)
+    assert len(loaded) == 2
+
+
+def test_load_training_data_aggregated_derived_columns(aggregated_training_data):
+    dataset_dir, msa_features = aggregated_training_data
+    loaded = load_training_data(dataset_dir, ["proportion_unique_topos_parsimony", "freq_a", "freq_c", "freq_g", "freq_t"])
+
+    assert loaded["proportion_unique_topos_parsimony"].tolist() == [0.5, 0.5]
+    frequencies = loaded[["freq_a", "freq_c", "freq_g", "freq_t"]].to_numpy()
+    assert frequencies == pytest.approx(np.tile([msa_features["char_frequencies"][c] for c in "ACGT"], (2, 1)))
+    assert frequencies.sum(axis=1) == pytest.approx([1, 1])
@@ -76,3 +76,36 @@ def test_get_std_branch_length_for_tree(newick_tree1):
 
     assert isinstance(std_brlen, float)
     assert std_brlen == pytest.approx(expected, abs=1e-6)
+
+
+def test_get_branch_lengths_array_matches_phylo(list_of_many_newick_trees):
+    for newick in list_of_many_newick_trees:
+        tree = get_tree_object(newick)
+        expected = [node.branch_length for node in tree.find_clades(branch_length=True)]
+        branch_lengths = get_branch_lengths_array(newick)
+
+        assert isinstance(branch_lengths, np.ndarray)
+        assert sorted(branch_lengths) == pytest.approx(sorted(expected))
+
+
+def test_get_branch_lengths_array_ignores_labels_and_comments():
+    newick = "(('taxon:1':0.1,B[&comment:5]:0.2):0.3,C:1e-06,D:0.0);"
+    branch_lengths = get_branch_lengths_array(newick)
+
+    assert branch_lengths.tolist() == pytest.approx([0.1, 0.2, 0.3, 1e-06])
+
+
+def test_branch_length_summary(newick_tree1):
+    summary = branch_length_summary(newick_tree1)
+
+    assert list(summary.keys()) == BRANCH_LENGTH_STATISTICS
+    assert summary["total"] == pytest.approx(0.149478, abs=1e-6)
+    assert summary["min"] == pytest.approx(1e-6, abs=1e-6)
+    assert summary["max"] == pytest.approx(0.071413, abs=1e-6)
+    assert summary["avg"] == pytest.approx(0.01660866, abs=1e-6)
+    assert summary["std"] == pytest.approx(0.0267655, abs=1e-6)
+
+
+def test_branch_length_summary_raises_value_error_without_branch_lengths():
+    with pytest.raises(ValueError):
+        branch_length_summary("((A,B),C,D);")
@@ -0,0 +1,39 @@
+from fixtures import *
+
+from tree_metrics import branch_length_summary, BRANCH_LENGTH_STATISTICS
+from tree_set_metrics import *
+
+
+@pytest.fixture
+def many_trees_path():
+    cwd = os.getcwd()
+    return f"{cwd}/.tests/data/trees/many.trees"
+
+
+def test_read_trees(many_trees_path, list_of_many_newick_trees):
+    trees = read_trees(many_trees_path)
+
+    assert isinstance(trees, list)
+    assert trees == [t for t in list_of_many_newick_trees if t]
+
+
+def test_branch_length_matrix(many_trees_path, list_of_many_newick_trees):
+    stats = branch_length_matrix(many_trees_path)
+
+    assert isinstance(stats, np.ndarray)
+    assert stats.shape == (len(list_of_many_newick_trees), len(BRANCH_LENGTH_STATISTICS))
+
+    for row, newick in zip(stats, list_of_many_newick_trees):
+        summary = branch_length_summary(newick)
+        assert row.tolist() == pytest.approx([summary[s] for s in BRANCH_LENGTH_STATISTICS])
+
+
+def test_branch_length_matrix_for_trees_empty_list():
+    stats = branch_length_matrix_for_trees([])
+
+    assert stats.shape == (0, len(BRANCH_LENGTH_STATISTICS))
+
+
+def test_branch_length_matrix_for_trees_raises_value_error_without_branch_lengths(newick_tree1):
+    with pytest.raises(ValueError):
+        branch_length_matrix_for_trees([newick_tree1, "((A,B),C,D);"])
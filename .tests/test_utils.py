@@ -44,3 +44,43 @@ def test_get_multiple_values_from_file_raises_value_error_if_string_not_in_file(
     with pytest.raises(ValueError):
         get_multiple_values_from_file(raxmlng_multiple_logs, "bananans")
 
+
+
+@pytest.mark.parametrize("content", ["", "\n", "a", "a\n", "a\n\nb", "a\nb\n", "line 1\nline 2\r\nlast line\n"])
+@pytest.mark.parametrize("block_size", [1, 3, 2**16])
+def test_read_file_contents_reversed(tmp_path, content, block_size):
+    log_file = tmp_path / "test.log"
+    log_file.write_bytes(content.encode())
+
+    lines = list(read_file_contents_reversed(str(log_file), block_size=block_size))
+
+    assert lines == read_file_contents(str(log_file))[::-1]
+
+
+def test_get_single_value_from_file_from_end(tmp_path):
+    log_file = tmp_path / "test.log"
+    log_file.write_text("Optimal log-likelihood: -10.5\n" + "noise\n" * 1000 + "Optimal log-likelihood: -8.25\n")
+
+    first = get_single_value_from_file(str(log_file), "Optimal log-likelihood:")
+    last = get_single_value_from_file(str(log_file), "Optimal log-likelihood:", from_end=True)
+
+    assert first == pytest.approx(-10.5)
+    assert last == pytest.approx(-8.25)
+
+    with pytest.raises(ValueError):
+        get_single_value_from_file(str(log_file), "bananans", from_end=True)
+
+
+def test_get_dataset_hash(tmp_path, example_msa_path):
+    settings = {"iqtree_model": "GTR4+FO", "pars_seeds": [0, 1]}
+    copied_msa = tmp_path / "copy.phy"
+    copied_msa.write_bytes(open(example_msa_path, "rb").read())
+
+    content_hash = get_dataset_hash(example_msa_path, settings)
+    assert len(content_hash) == 64
+    # the hash only depends on the content and the settings, not on the path or the order of the settings
+    assert get_dataset_hash(str(copied_msa), dict(reversed(list(settings.items()))), block_size=7) == content_hash
+    assert get_dataset_hash(example_msa_path, {**settings, "pars_seeds": [0, 1, 2]}) != content_hash
+
+    copied_msa.write_bytes(open(example_msa_path, "rb").read() + b"\n")
+    assert get_dataset_hash(str(copied_msa), settings) != content_hash
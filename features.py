@@ -69,6 +69,29 @@ ADDITIONAL_FEATURES = [
     "std_parsimony_score",
 ]
 
+"""
+Summary of the column entropies computed by this pipeline: quantiles and proportion of columns per entropy bin
+(see rules/scripts/column_entropies.py). These columns are not part of the published training data.
+"""
+
+COLUMN_ENTROPY_SUMMARY_FEATURES = [
+    "column_entropy_min",
+    "column_entropy_q10",
+    "column_entropy_q25",
+    "column_entropy_median",
+    "column_entropy_q75",
+    "column_entropy_q90",
+    "column_entropy_max",
+    "column_entropy_hist_0",
+    "column_entropy_hist_1",
+    "column_entropy_hist_2",
+    "column_entropy_hist_3",
+    "column_entropy_hist_4",
+    "column_entropy_hist_5",
+    "column_entropy_hist_6",
+    "column_entropy_hist_7",
+]
+
 """
 Features used for label generation.
 CAREFUL: if you use the LABEL column, you should not use these features to train a predictor. 
@@ -2,17 +2,17 @@ rule iqtree_filter_unique_tree_topologies:
     """
     The statistical tests can be biased by the number of trees in the candidate set. 
     Therefore, before perfoming the tests on the eval trees we filter duplicate topologies.
+    The trees are grouped by topology in-process.
     This rule produces two output:
     - A .trees file containing the unique topologies
-    - A .pkl file (pickle file) that contains a list of sets with the clusters, so we can later match 
-        IQ-Tree test results to newick tree strings 
+    - A .npy file (NumPy array) that maps the index of each eval tree to the ID of its cluster, so we can later match 
+        IQ-Tree test results to the eval trees
     """
     input:
-        all_eval_trees              = rules.collect_eval_trees.output.all_eval_trees,
-        eval_trees_rfdistances_log  = rules.raxmlng_rfdistance_eval_trees.output.rfDist_log,
+        all_eval_trees  = rules.collect_eval_trees.output.all_eval_trees,
     output:
         filtered_trees  = f"{output_files_iqtree_dir}filteredEvalTrees.trees",
-        clusters        = f"{output_files_iqtree_dir}filteredEvalTrees.clusters.pkl",
+        clusters        = f"{output_files_iqtree_dir}filteredEvalTrees.clusters.npy",
     script:
         "scripts/filter_tree_topologies.py"  
 
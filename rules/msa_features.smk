@@ -1,9 +1,28 @@
+# the MSA features are either computed from the memory mapped alignment store or directly from the MSA file
+if config["msa_features"]["alignment_store"]:
+    msa_features_input = dict(alignment_store = f"{output_files_dir}alignment.msastore")
+else:
+    msa_features_input = dict()
+
+
+rule convert_msa:
+    output:
+        alignment_store = f"{output_files_dir}alignment.msastore"
+    params:
+        msa = lambda wildcards: msas[wildcards.msa],
+    script:
+        "scripts/alignment_store.py"
+
+
 rule compute_msa_features:
+    input:
+        **msa_features_input
     output:
         msa_features =  f"{output_files_dir}msa_features.json"
     params:
         msa                 = lambda wildcards: msas[wildcards.msa],
         model               = lambda wildcards: iqtree_models[wildcards.msa],  # Use IQ-Tree models
-        iqtree_command      = iqtree_command  # Use IQ-Tree command
+        iqtree_command      = iqtree_command,  # Use IQ-Tree command
+        patterns_gaps_invariant = config["msa_features"]["patterns_gaps_invariant"],
     script:
         "scripts/collect_msa_features_iqtree.py"  # Use IQ-Tree script
@@ -1,3 +1,20 @@
+# storage backend of save_data: "sqlite" writes a SQLite database (moved to the db_path by move_db),
+# "parquet" writes the dataset, IQ-Tree tree, parsimony tree and taxon tables directly as Parquet files to the db_path
+save_data_backend = config["save_data"]["backend"]
+
+if save_data_backend == "parquet":
+    save_data_output = dict(
+        dataset         = f"{db_path}dataset.parquet",
+        iqtree_trees    = f"{db_path}iqtree_trees.parquet",
+        parsimony_trees = f"{db_path}parsimony_trees.parquet",
+        taxa            = f"{db_path}taxa.parquet",
+    )
+    msa_dataset_table = f"{db_path}dataset.parquet"
+else:
+    save_data_output = dict(database = "{msa}_data.sqlite3")
+    msa_dataset_table = f"{db_path}data.sqlite3"
+
+
 rule save_data:
     input:
         # Tree seach tree files and logs
@@ -7,9 +24,7 @@ rule save_data:
         rand_search_trees   = expand(iqtree_tree_inference_prefix_rand + "_xgphy.treefile", seed=rand_seeds, allow_missing=True),
         rand_search_logs    = expand(iqtree_tree_inference_prefix_rand + "_xgphy.log",seed=rand_seeds,allow_missing=True),
         search_logs_collected = f"{iqtree_tree_inference_dir}AllSearchLogs.log",
-
-        # Tree search tree RFDistance logs
-        search_rfdistance = f"{iqtree_tree_inference_dir}inference.raxml.rfDistances.log",
+        search_trees_collected = f"{iqtree_tree_inference_dir}AllSearchTrees.trees",
 
         # Eval tree files and logs
         pars_eval_trees = expand(iqtree_tree_eval_prefix_pars + ".treefile", seed=pars_seeds, allow_missing=True),
@@ -17,17 +32,14 @@ rule save_data:
         rand_eval_trees = expand(iqtree_tree_eval_prefix_rand + ".treefile", seed=rand_seeds, allow_missing=True),
         rand_eval_logs  = expand(iqtree_tree_eval_prefix_rand + ".log",seed=rand_seeds,allow_missing=True),
         eval_logs_collected = f"{iqtree_tree_eval_dir}AllEvalLogs.log",
+        eval_trees_collected = f"{iqtree_tree_eval_dir}AllEvalTrees.trees",
 
-        # Eval tree RFDistance logs
-        eval_rfdistance = f"{iqtree_tree_eval_dir}eval.raxml.rfDistances.log",
-
-        # Plausible tree RFDistance logs
-        plausible_rfdistance = f"{iqtree_tree_eval_dir}plausible.raxml.rfDistances.log",
+        # Plausible trees
         plausible_trees_collected = f"{iqtree_tree_eval_dir}AllPlausibleTrees.trees",
 
         # IQ-Tree significance test results and clusters
         iqtree_results  = f"{output_files_iqtree_dir}significance.iqtree",
-        clusters        = f"{output_files_iqtree_dir}filteredEvalTrees.clusters.pkl",
+        clusters        = f"{output_files_iqtree_dir}filteredEvalTrees.clusters.npy",
 
         # MSA Features
         msa_features = f"{output_files_dir}msa_features.json",
@@ -35,13 +47,28 @@ rule save_data:
         # Parsimony Trees and logs
         parsimony_trees = f"{output_files_parsimony_trees}AllParsimonyTrees.trees",
         parsimony_logs = f"{output_files_parsimony_trees}AllParsimonyLogs.log",
-        parsimony_rfdistance = f"{output_files_parsimony_trees}parsimony.raxml.rfDistances.log",
     output:
-        database = "{msa}_data.sqlite3"
+        **save_data_output
     params:
         iqtree_command = iqtree_command,  
         raxmlng_command = raxmlng_command,
         msa             = lambda wildcards: msas[wildcards.msa],
+        data_type       = lambda wildcards: data_types[wildcards.msa],
+        # together with the content of the MSA, these settings identify the dataset, see utils.get_dataset_hash
+        dataset_settings = lambda wildcards: dict(
+            iqtree_model    = iqtree_models[wildcards.msa],
+            pars_seeds      = list(pars_seeds),
+            rand_seeds      = list(rand_seeds),
+            parsimony_seeds = list(parsimony_seeds),
+        ),
+        # SQLite sidecar caching the parsed log values, unchanged logs are not re-parsed on reruns
+        parsed_log_cache = lambda wildcards: output_files_dir.format(msa=wildcards.msa) + "parsed_logs.sqlite3",
+        threads         = config["save_data"]["threads"],
+        db_pragmas      = config["save_data"]["pragmas"],
+        backend         = save_data_backend,
+        column_entropies = config["save_data"]["column_entropies"],
+        newick          = config["save_data"]["newick"],
+        newick_taxa     = config["save_data"]["newick_taxa"],
     script:
         "scripts/save_data.py"  
 
@@ -59,7 +86,7 @@ rule move_db:
 
 rule database_to_training_dataframe:
     input:
-        database = rules.move_db.output.database,
+        dataset_table = msa_dataset_table,
     output:
         dataframe = f"{db_path}training_data.parquet"
     params:
@@ -67,4 +94,19 @@ rule database_to_training_dataframe:
         num_rand_trees = num_rand_trees,
         num_parsimony_trees = num_parsimony_trees
     script:
-        "scripts/database_to_dataframe.py"
\ No newline at end of file
+        "scripts/database_to_dataframe.py"
+
+rule aggregate_training_data:
+    # corpus-level training data of all MSAs as one Parquet dataset partitioned by the data type
+    # this rule is not part of rule all, run it with: snakemake aggregate_training_data --cores [num_cores]
+    input:
+        expand(msa_dataset_table, msa=msa_names)
+    output:
+        dataset_dir = directory(f"{outdir}training_data.parquet")
+    params:
+        num_pars_trees = num_pars_trees,
+        num_rand_trees = num_rand_trees,
+        num_parsimony_trees = num_parsimony_trees,
+        threads = config["save_data"]["threads"],
+    script:
+        "scripts/aggregate_training_data.py"
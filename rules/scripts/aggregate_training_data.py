@@ -0,0 +1,118 @@
+import concurrent.futures
+import glob
+import os
+import sys
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from custom_types import *
+from database import Dataset
+from database_to_dataframe import DNA_FREQUENCY_COLUMNS, read_dataset_table, add_derived_columns
+from parquet_writer import get_arrow_schema
+
+DERIVED_COLUMNS = [
+    "num_topos_plausible/num_trees_plausible",
+    "num_topos_parsimony/num_trees_parsimony",
+    "proportion_unique_topos_parsimony",
+    "num_topos_search/num_trees_search",
+    "num_topos_eval/num_trees_eval",
+    "num_patterns/num_taxa",
+    "num_sites/num_taxa",
+    *DNA_FREQUENCY_COLUMNS,
+    "difficult",
+]
+
+
+def find_msa_databases(outdir: FilePath) -> List[FilePath]:
+    """
+    Returns the dataset table of each MSA subdirectory in the given outdir, sorted by the MSA name.
+    This is the dataset.parquet file if save_data used the parquet backend, otherwise the data.sqlite3 database.
+    """
+    paths = []
+    for msa_dir in sorted(glob.glob(os.path.join(outdir, "*", ""))):
+        for name in ["dataset.parquet", "data.sqlite3"]:
+            path = os.path.join(msa_dir, name)
+            if os.path.isfile(path):
+                paths.append(path)
+                break
+    return paths
+
+
+def get_training_data_schema() -> pa.Schema:
+    """Schema of the aggregated training data: the columns of the dataset table followed by the derived columns."""
+    schema = get_arrow_schema(Dataset)
+    for column in DERIVED_COLUMNS:
+        schema = schema.append(pa.field(column, pa.float64()))
+    return schema
+
+
+def aggregate_training_data(
+    paths: List[FilePath],
+    dataset_dir: FilePath,
+    num_trees: int,
+    num_parsimony_trees: int,
+    num_workers: int = 1,
+    batch_size: int = 1024,
+) -> int:
+    """
+    Reads the dataset tables of all given MSAs in num_workers worker processes and streams them into a Parquet
+    dataset at dataset_dir, partitioned by the data type. The rows are written in batches of batch_size MSAs,
+    the derived columns of database_to_dataframe are computed per batch.
+    The rows are written in the order of the given paths. Returns the number of rows written.
+    """
+    if os.path.isdir(dataset_dir) and os.listdir(dataset_dir):
+        raise ValueError(f"The output directory {dataset_dir} is not empty.")
+
+    schema = get_training_data_schema()
+    num_rows = 0
+
+    def _write_batch(frames, batch_index):
+        df = add_derived_columns(pd.concat(frames, ignore_index=True), num_trees, num_parsimony_trees)
+        table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+        pq.write_to_dataset(
+            table,
+            dataset_dir,
+            partition_cols=["data_type"],
+            basename_template=f"part-{batch_index:05d}-{{i}}.parquet",
+        )
+        return table.num_rows
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max(1, num_workers)) as executor:
+        frames = []
+        batch_index = 0
+        chunksize = max(1, min(batch_size, len(paths) // (4 * max(1, num_workers))))
+        # map returns the tables in the order of the given paths while the workers read ahead
+        for df in executor.map(read_dataset_table, paths, chunksize=chunksize):
+            frames.append(df)
+            if len(frames) == batch_size:
+                num_rows += _write_batch(frames, batch_index)
+                frames = []
+                batch_index += 1
+
+        if frames:
+            num_rows += _write_batch(frames, batch_index)
+
+    return num_rows
+
+
+if __name__ == "__main__":
+    if "snakemake" in globals():
+        paths = list(snakemake.input)
+        dataset_dir = snakemake.output.dataset_dir
+        num_trees = snakemake.params.num_pars_trees + snakemake.params.num_rand_trees
+        num_parsimony_trees = snakemake.params.num_parsimony_trees
+        num_workers = snakemake.params.threads
+    else:
+        if len(sys.argv) not in [5, 6]:
+            print("Usage: aggregate_training_data.py <outdir> <dataset_dir> <num_trees> <num_parsimony_trees> [num_workers]")
+            sys.exit(1)
+        paths = find_msa_databases(sys.argv[1])
+        dataset_dir = sys.argv[2]
+        num_trees = int(sys.argv[3])
+        num_parsimony_trees = int(sys.argv[4])
+        num_workers = int(sys.argv[5]) if len(sys.argv) == 6 else os.cpu_count()
+
+    num_rows = aggregate_training_data(paths, dataset_dir, num_trees, num_parsimony_trees, num_workers)
+    print(f"Wrote {num_rows} rows to {dataset_dir}")
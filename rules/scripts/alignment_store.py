@@ -0,0 +1,121 @@
+"""
+Binary alignment store: the alignment matrix of msa_features.Alignment (taxa x sites, one uint8 per character,
+upper case with normalized gaps) is stored uncompressed after a small header and read as read-only memory map.
+Concurrent processes reading the same store share the pages in the page cache instead of each holding a copy,
+and only the parts of the alignment that are accessed are read from disk.
+
+Layout:
+    magic (8 bytes) | format version (uint32) | header size (uint32) | JSON header | padding | alignment matrix
+The JSON header contains the data type, the taxon names and the number of sites.
+The alignment matrix starts at a multiple of the page size.
+"""
+import json
+import struct
+import sys
+
+import numpy as np
+
+from custom_types import *
+from msa_features import Alignment, _get_normalization, _iter_sequence_chunks, read_alignment
+
+MAGIC = b"MSASTORE"
+FORMAT_VERSION = 1
+_PREFIX = struct.Struct("<8sII")
+_PAGE_SIZE = 4096
+
+
+def _get_data_offset(header_size: int) -> int:
+    return -(-(_PREFIX.size + header_size) // _PAGE_SIZE) * _PAGE_SIZE
+
+
+def convert_msa(msa_file: FilePath, store_file: FilePath) -> Tuple[int, int]:
+    """
+    Converts the given FASTA or PHYLIP file into an alignment store, see read_alignment_store.
+    The MSA is streamed twice: once to determine the taxa, the number of sites and the data type,
+    and once to write the normalized sequences into the memory mapped store. The MSA is never fully held in memory.
+    Returns the number of taxa and sites.
+
+    Raises:
+        ValueError: If the MSA cannot be read, see msa_features.read_alignment.
+    """
+    taxa, lengths = [], []
+    occurrences = np.zeros(256, dtype=np.int64)
+    for index, taxon, data in _iter_sequence_chunks(msa_file):
+        if taxon is not None:
+            taxa.append(taxon)
+            lengths.append(0)
+        lengths[index] += len(data)
+        occurrences += np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=256)
+
+    if len(set(lengths)) != 1:
+        raise ValueError(f"The sequences in {msa_file} differ in length.")
+
+    num_taxa, num_sites = len(taxa), lengths[0]
+    data_type, lookup = _get_normalization(set(np.flatnonzero(occurrences).tolist()), msa_file)
+
+    header = json.dumps(dict(data_type=data_type, taxa=taxa, num_sites=num_sites)).encode()
+    offset = _get_data_offset(len(header))
+    with open(store_file, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        f.truncate(offset + num_taxa * num_sites)
+
+    sequences = np.memmap(store_file, dtype=np.uint8, mode="r+", offset=offset, shape=(num_taxa, num_sites))
+    positions = [0] * num_taxa
+    for index, _, data in _iter_sequence_chunks(msa_file):
+        start = positions[index]
+        sequences[index, start: start + len(data)] = lookup[np.frombuffer(data, dtype=np.uint8)]
+        positions[index] += len(data)
+    sequences.flush()
+    del sequences
+
+    return num_taxa, num_sites
+
+
+def is_alignment_store(file_path: FilePath) -> bool:
+    with open(file_path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def read_alignment_store(store_file: FilePath) -> Alignment:
+    """
+    Returns the Alignment of the given alignment store, the sequences are a read-only memory map of the store.
+
+    Raises:
+        ValueError: If the file is not an alignment store or was written with another format version.
+    """
+    with open(store_file, "rb") as f:
+        magic, version, header_size = _PREFIX.unpack(f.read(_PREFIX.size))
+        if magic != MAGIC:
+            raise ValueError(f"The given file {store_file} is not an alignment store.")
+        if version != FORMAT_VERSION:
+            raise ValueError(
+                f"The alignment store {store_file} has the format version {version}, expected {FORMAT_VERSION}. "
+                f"Please convert the MSA again."
+            )
+        header = json.loads(f.read(header_size))
+
+    shape = (len(header["taxa"]), header["num_sites"])
+    sequences = np.memmap(store_file, dtype=np.uint8, mode="r", offset=_get_data_offset(header_size), shape=shape)
+    return Alignment(header["taxa"], sequences, header["data_type"])
+
+
+def load_alignment(file_path: FilePath) -> Alignment:
+    """Reads the given alignment store or FASTA/PHYLIP file."""
+    if is_alignment_store(file_path):
+        return read_alignment_store(file_path)
+    return read_alignment(file_path)
+
+
+if __name__ == "__main__":
+    if "snakemake" in globals():
+        msa_file = snakemake.params.msa
+        store_file = snakemake.output.alignment_store
+    else:
+        if len(sys.argv) != 3:
+            print("Usage: alignment_store.py <msa_file> <store_file>")
+            sys.exit(1)
+        msa_file, store_file = sys.argv[1:]
+
+    num_taxa, num_sites = convert_msa(msa_file, store_file)
+    print(f"Converted {msa_file} with {num_taxa} taxa and {num_sites} sites to {store_file}")
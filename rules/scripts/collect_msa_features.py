@@ -1,32 +1,26 @@
 import json
 
-from pypythia.msa import MSA
 from pypythia.raxmlng import RAxMLNG
 
+from alignment_store import load_alignment
+from msa_features import get_msa_features
+
 msa_file = snakemake.params.msa
 model = snakemake.params.model
 
-msa = MSA(msa_file)
-
-# the Biopython DistanceCalculator does not support morphological data
-# so for morphological data we cannot compute the treelikeness at the moment
-compute_treelikeness = msa.data_type != "MORPH"
-
-raxmlng = RAxMLNG(snakemake.params.raxmlng_command)
+# the alignment is read once and all count based features are computed from the per-site character counts
+# with the alignment store, the alignment is a read-only memory map of the store instead of a copy in memory
+alignment = load_alignment(snakemake.input.get("alignment_store", msa_file))
 
-patterns, gaps, invariant = raxmlng.get_patterns_gaps_invariant(msa_file, model)
+if snakemake.params.patterns_gaps_invariant == "tool":
+    # the number of patterns, gaps and invariant sites are scraped from the log of a RAxML-NG run on the MSA
+    raxmlng = RAxMLNG(snakemake.params.raxmlng_command)
+    patterns_gaps_invariant = raxmlng.get_patterns_gaps_invariant(msa_file, model)
+else:
+    # computed in-process as RAxML-NG reports them
+    patterns_gaps_invariant = None
 
-msa_features = {
-    "taxa": msa.number_of_taxa(),
-    "sites": msa.number_of_sites(),
-    "patterns": patterns,
-    "gaps": gaps,
-    "invariant": invariant,
-    "entropy": msa.entropy(),
-    "column_entropies": msa.column_entropies(),
-    "bollback": msa.bollback_multinomial(),
-    "treelikeness": msa.treelikeness_score() if compute_treelikeness else None,
-}
+msa_features = get_msa_features(alignment, "raxml-ng", patterns_gaps_invariant)
 
 with open(snakemake.output.msa_features, "w") as f:
     json.dump(msa_features, f)
@@ -1,23 +1,23 @@
-import pickle
-from iqtree_statstest_parser import get_iqtree_results, get_iqtree_results_for_eval_tree_str
+import numpy as np
+from iqtree_statstest_parser import get_iqtree_results
+from tree_set_metrics import read_trees
 
 
 iqtree_results = get_iqtree_results(snakemake.input.iqtree_results)
-with open(snakemake.input.clusters, "rb") as f:
-    clusters = pickle.load(f)
+# cluster_ids[i] is the cluster of the i-th eval tree and the index of its IQ-Tree test results
+cluster_ids = np.load(snakemake.input.clusters, allow_pickle=False)
 
-eval_trees = open(snakemake.input.eval_trees).readlines()
-plausible_trees = []
+eval_trees = read_trees(snakemake.input.eval_trees)
+assert len(eval_trees) == len(cluster_ids)
 
-for newick_eval in eval_trees:
-    if not newick_eval:
-        continue
+plausible_trees = []
 
-    statstest_results, _ = get_iqtree_results_for_eval_tree_str(iqtree_results, newick_eval, clusters)
+for newick_eval, cluster_id in zip(eval_trees, cluster_ids):
+    statstest_results = iqtree_results[cluster_id]
     plausible = statstest_results["plausible"]
 
     if plausible:
-        plausible_trees.append(newick_eval.strip())
+        plausible_trees.append(newick_eval)
 
 with open(snakemake.output.all_plausible_trees, "w") as f:
     f.write("\n".join(plausible_trees))
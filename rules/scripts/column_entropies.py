@@ -0,0 +1,55 @@
+import json
+
+import numpy as np
+
+from custom_types import *
+
+# quantiles of the column entropies stored in the column_entropy_q* columns
+COLUMN_ENTROPY_QUANTILES = {
+    "q10": 0.1,
+    "q25": 0.25,
+    "median": 0.5,
+    "q75": 0.75,
+    "q90": 0.9,
+}
+
+# bin edges of the column_entropy_hist_* columns, the last bin contains all columns with an entropy >= 3.0
+COLUMN_ENTROPY_HISTOGRAM_EDGES = [0.0, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, np.inf]
+
+COLUMN_ENTROPY_SUMMARY_COLUMNS = (
+    ["column_entropy_min"]
+    + [f"column_entropy_{name}" for name in COLUMN_ENTROPY_QUANTILES]
+    + ["column_entropy_max"]
+    + [f"column_entropy_hist_{i}" for i in range(len(COLUMN_ENTROPY_HISTOGRAM_EDGES) - 1)]
+)
+
+
+def get_column_entropy_summary(column_entropies: List[float]) -> Dict[str, float]:
+    """
+    Returns the minimum, maximum and quantiles of the given column entropies
+    and the proportion of columns in each bin of COLUMN_ENTROPY_HISTOGRAM_EDGES.
+    The keys are the column names in the dataset table (COLUMN_ENTROPY_SUMMARY_COLUMNS).
+    """
+    values = np.asarray(column_entropies, dtype=float)
+    if values.size == 0:
+        return dict.fromkeys(COLUMN_ENTROPY_SUMMARY_COLUMNS)
+
+    quantiles = np.quantile(values, [0.0, *COLUMN_ENTROPY_QUANTILES.values(), 1.0])
+    counts, _ = np.histogram(values, bins=COLUMN_ENTROPY_HISTOGRAM_EDGES)
+
+    return dict(zip(COLUMN_ENTROPY_SUMMARY_COLUMNS, [*quantiles.tolist(), *(counts / values.size).tolist()]))
+
+
+def read_column_entropies(value) -> Optional[np.ndarray]:
+    """
+    Returns the column entropies stored in the dataset table as float32 array.
+    The value can be the packed float32 blob (column_entropies_float32), a list of floats as read from Parquet
+    or the JSON text of the column_entropies column.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return np.frombuffer(value, dtype="<f4")
+    if isinstance(value, str):
+        value = json.loads(value)
+    return np.asarray(value, dtype=np.float32)
@@ -1,5 +1,5 @@
 from pypythia.custom_types import *
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, FrozenSet, Iterator, List, Optional, Set, Tuple, Union
 
 Newick = str
 TreeIndex = int
@@ -1,13 +1,71 @@
+import numpy as np
 import peewee as P
+import sys
+from typing import Dict, List, Optional, Type
+from playhouse.migrate import SqliteMigrator, migrate
 from playhouse.sqlite_ext import JSONField
 
+from newick_compression import decompress_newick
+from taxon_encoding import decode_taxa
+
 db = P.SqliteDatabase(None)
 
+# SQLite versions before 3.32 allow at most 999 variables per statement
+SQLITE_MAX_VARIABLES = 999
 
-class Dataset(P.Model):
-    uuid = P.UUIDField()
+
+class Float32ArrayField(P.BlobField):
+    """
+    Stores a list or array of floats as packed little-endian float32 blob, the values are returned as NumPy array.
+    """
+
+    def db_value(self, value):
+        if value is None:
+            return None
+        return super().db_value(np.asarray(value, dtype="<f4").tobytes())
+
+    def python_value(self, value):
+        if value is None:
+            return None
+        return np.frombuffer(value, dtype="<f4")
+
+
+class CompressedNewickMixin:
+    """
+    Trees are either stored as text in the newick_* columns or zlib compressed in the newick_*_zlib columns,
+    see save_data.newick in the config and newick_compression.py.
+    If the dataset has taxa_encoded set, the taxon labels in the stored trees are replaced by their index
+    in the Taxon table, see save_data.newick_taxa in the config and taxon_encoding.py.
+    """
+
+    def get_dataset(self):
+        return self.dataset
+
+    def get_newick(self, column: str):
+        """
+        Returns the Newick string of the given column (e.g. "newick_search") regardless of how the tree is stored.
+        Compressed trees are decompressed and taxon indices are replaced by the taxon labels only when calling this method.
+        """
+        dataset = self.get_dataset()
+        newick = getattr(self, column)
+
+        if newick is None:
+            data = getattr(self, column + "_zlib")
+            if data is None:
+                return None
+            newick = decompress_newick(bytes(data), dataset.newick_dictionary)
+
+        if dataset.taxa_encoded:
+            newick = decode_taxa(newick, dataset.get_taxa())
+        return newick
+
+
+class Dataset(CompressedNewickMixin, P.Model):
+    uuid = P.UUIDField(index=True)
+    # hash of the MSA file and the settings of the run, identifies the dataset across runs, see upsert_dataset
+    content_hash = P.CharField(null=True, unique=True)
     verbose_name = P.TextField(null=True)
-    data_type = P.TextField(null=True)
+    data_type = P.TextField(null=True, index=True)
 
     # Label features
     num_searches = P.IntegerField(null=True)
@@ -46,6 +104,11 @@ class Dataset(P.Model):
     maximum_branch_length_final = P.FloatField(null=True)
     newick_starting = P.TextField(null=True)
     newick_final = P.TextField(null=True)
+    newick_final_zlib = P.BlobField(null=True)
+    # preset zlib dictionary of the compressed trees of this dataset
+    newick_dictionary = P.BlobField(null=True)
+    # if set, the stored trees of this dataset contain taxon indices instead of labels, see Taxon
+    taxa_encoded = P.BooleanField(null=True)
 
     # MSA Features
     num_taxa = P.IntegerField(null=True)
@@ -55,8 +118,28 @@ class Dataset(P.Model):
     proportion_invariant = P.FloatField(null=True)
     entropy = P.FloatField(null=True)
     column_entropies = JSONField(null=True)
+    # compact storage of the column entropies, see save_data.column_entropies in the config
+    column_entropies_float32 = Float32ArrayField(null=True)
+    # summary of the column entropies, see column_entropies.py
+    column_entropy_min = P.FloatField(null=True)
+    column_entropy_q10 = P.FloatField(null=True)
+    column_entropy_q25 = P.FloatField(null=True)
+    column_entropy_median = P.FloatField(null=True)
+    column_entropy_q75 = P.FloatField(null=True)
+    column_entropy_q90 = P.FloatField(null=True)
+    column_entropy_max = P.FloatField(null=True)
+    column_entropy_hist_0 = P.FloatField(null=True)
+    column_entropy_hist_1 = P.FloatField(null=True)
+    column_entropy_hist_2 = P.FloatField(null=True)
+    column_entropy_hist_3 = P.FloatField(null=True)
+    column_entropy_hist_4 = P.FloatField(null=True)
+    column_entropy_hist_5 = P.FloatField(null=True)
+    column_entropy_hist_6 = P.FloatField(null=True)
+    column_entropy_hist_7 = P.FloatField(null=True)
     bollback = P.FloatField(null=True)
     treelikeness = P.FloatField(null=True)
+    # relative frequency of each character of the MSA (gaps are ignored), e.g. {"A": 0.3, "C": 0.2, ...}
+    char_frequencies = JSONField(null=True)
 
     # Parsimony Trees Features
     avg_rfdist_parsimony = P.FloatField(null=True)
@@ -67,16 +150,45 @@ class Dataset(P.Model):
     class Meta:
         database = db
 
+    def get_dataset(self):
+        return self
+
+    def get_taxa(self) -> List[str]:
+        """Returns the taxon labels of this dataset ordered by their index."""
+        if not hasattr(self, "_taxa"):
+            query = Taxon.select(Taxon.label).where(Taxon.dataset == self).order_by(Taxon.index)
+            self._taxa = [taxon.label for taxon in query]
+        return self._taxa
+
 
-class RaxmlNGTree(P.Model):
+class Taxon(P.Model):
+    """
+    Taxon dictionary of a dataset, trees stored with taxa_encoded refer to the taxa by their index.
+    """
+    dataset = P.ForeignKeyField(Dataset)
+    dataset_uuid = P.UUIDField()
+    index = P.IntegerField()
+    label = P.TextField()
+
+    class Meta:
+        database = db
+        indexes = (
+            (("dataset", "index"), True),
+            (("dataset_uuid", "index"), False),
+        )
+
+
+class RaxmlNGTree(CompressedNewickMixin, P.Model):
     uuid = P.UUIDField()
     dataset = P.ForeignKeyField(Dataset)
     dataset_uuid = P.UUIDField()
     starting_type = P.CharField(choices=[("random", "random"), ("parsimony", "parsimony")])
     newick_search = P.TextField(null=True)
+    newick_search_zlib = P.BlobField(null=True)
     llh_search = P.FloatField(null=True)
     compute_time_search = P.FloatField(null=True)
     newick_eval = P.TextField(null=True)
+    newick_eval_zlib = P.BlobField(null=True)
     llh_eval = P.FloatField(null=True)
     compute_time_eval = P.FloatField(null=True)
 
@@ -101,27 +213,44 @@ class RaxmlNGTree(P.Model):
 
     class Meta:
         database = db
+        # per-dataset queries for the plausible trees and the trees of a cluster, see queries.py
+        indexes = (
+            (("dataset_uuid", "plausible"), False),
+            (("dataset_uuid", "cluster_id"), False),
+        )
 
 
-class ParsimonyTree(P.Model):
+class ParsimonyTree(CompressedNewickMixin, P.Model):
     uuid = P.UUIDField()
     dataset = P.ForeignKeyField(Dataset)
-    dataset_uuid = P.UUIDField()
+    dataset_uuid = P.UUIDField(index=True)
     newick_tree = P.TextField(null=True)
+    newick_tree_zlib = P.BlobField(null=True)
     parsimony_score = P.FloatField(null=True)
     compute_time = P.FloatField(null=True)
 
     class Meta:
         database = db
 
-class IQTreeTree(P.Model):
+class IQTreeTree(CompressedNewickMixin, P.Model):
     uuid = P.UUIDField()
     dataset = P.ForeignKeyField(Dataset)
     dataset_uuid = P.UUIDField()
     starting_type = P.CharField(choices=[("random", "random"), ("parsimony", "parsimony")])
     newick_search = P.TextField(null=True)
+    newick_search_zlib = P.BlobField(null=True)
     llh_search = P.FloatField(null=True)
     compute_time_search = P.FloatField(null=True)
+    average_branch_length_search = P.FloatField(null=True)
+    std_branch_length_search = P.FloatField(null=True)
+    total_branch_length_search = P.FloatField(null=True)
+    minimum_branch_length_search = P.FloatField(null=True)
+    maximum_branch_length_search = P.FloatField(null=True)
+    average_branch_length_eval = P.FloatField(null=True)
+    std_branch_length_eval = P.FloatField(null=True)
+    total_branch_length_eval = P.FloatField(null=True)
+    minimum_branch_length_eval = P.FloatField(null=True)
+    maximum_branch_length_eval = P.FloatField(null=True)
     plausible = P.BooleanField(null=True)
     cluster_id = P.IntegerField(null=True)
 
@@ -142,3 +271,102 @@ class IQTreeTree(P.Model):
 
     class Meta:
         database = db
+        # per-dataset queries for the plausible trees and the trees of a cluster, see queries.py
+        indexes = (
+            (("dataset_uuid", "plausible"), False),
+            (("dataset_uuid", "cluster_id"), False),
+        )
+
+
+MODELS = [Dataset, RaxmlNGTree, ParsimonyTree, IQTreeTree, Taxon]
+
+
+def migrate_database(database_file: str) -> List[str]:
+    """
+    Migrates an existing database to the current schema: adds missing tables, missing (nullable) columns
+    and all indexes declared in the models, and updates the statistics of the query planner.
+    Returns the added columns as "table.column".
+    """
+    db.init(database_file)
+    db.connect(reuse_if_open=True)
+    migrator = SqliteMigrator(db)
+    added = []
+
+    with db.atomic():
+        for model in MODELS:
+            table = model._meta.table_name
+            if not db.table_exists(table):
+                continue
+            columns = {column.name for column in db.get_columns(table)}
+            operations = []
+            for field in model._meta.sorted_fields:
+                if field.column_name in columns:
+                    continue
+                if not field.null and field.default is None:
+                    raise ValueError(f"Cannot add the non-nullable column {table}.{field.column_name} without default.")
+                operations.append(migrator.add_column(table, field.column_name, field))
+                added.append(f"{table}.{field.column_name}")
+            migrate(*operations)
+
+        # creates the missing tables and the missing indexes of existing tables
+        db.create_tables(MODELS, safe=True)
+
+    db.execute_sql("ANALYZE")
+    db.close()
+    return added
+
+
+def bulk_insert(model, rows, **values):
+    """
+    Inserts the given rows (dicts of field name to value) into the table of the given model with batched INSERTs.
+    The keyword arguments are set for all rows, e.g. the dataset foreign key.
+    Wrap calls in db.atomic() to write all rows in a single transaction.
+    """
+    if not rows:
+        return
+    rows = [{**row, **values} for row in rows]
+    batch_size = max(1, SQLITE_MAX_VARIABLES // len(rows[0]))
+    for batch in P.chunked(rows, batch_size):
+        model.insert_many(batch).execute()
+
+
+def delete_dataset(dataset: Dataset):
+    """Deletes the given dataset and all rows referring to it."""
+    with db.atomic():
+        for model in MODELS:
+            if model is not Dataset:
+                model.delete().where(model.dataset == dataset).execute()
+        dataset.delete_instance()
+
+
+def upsert_dataset(
+    dataset_row: Dict, rows: Dict[Type[P.Model], List[Dict]], replace: bool = False
+) -> Optional[Dataset]:
+    """
+    Inserts the given dataset row and the rows of the other tables (e.g. {IQTreeTree: [...], Taxon: [...]})
+    referring to it in a single transaction, unless a dataset with the same content_hash already exists.
+    In this case, the dataset is unchanged and nothing is written, if replace is set the existing dataset
+    and its rows are replaced instead.
+    Returns the inserted dataset or None if the dataset was skipped.
+    """
+    with db.atomic():
+        content_hash = dataset_row.get("content_hash")
+        existing = Dataset.get_or_none(Dataset.content_hash == content_hash) if content_hash else None
+        if existing is not None:
+            if not replace:
+                return None
+            delete_dataset(existing)
+
+        dataset = Dataset.create(**dataset_row)
+        for model, model_rows in rows.items():
+            bulk_insert(model, model_rows, dataset=dataset)
+    return dataset
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: database.py <database_file> [<database_file> ...]")
+        sys.exit(1)
+    for database_file in sys.argv[1:]:
+        added = migrate_database(database_file)
+        print(f"Migrated {database_file}, added columns: {', '.join(added) if added else 'none'}")
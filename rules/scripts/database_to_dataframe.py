@@ -1,70 +1,112 @@
+import json
 import sqlite3
 import pandas as pd
 import numpy as np
 
+from column_entropies import read_column_entropies
 from custom_types import *
 
 
-def get_difficulty_labels(df: pd.DataFrame) -> List[float]:
+DIFFICULTY_COLUMNS = [
+    "avg_rfdist_eval",
+    "avg_rfdist_plausible",
+    "num_topos_eval/num_trees_eval",
+    "num_topos_plausible/num_trees_plausible",
+]
+INVERTED_DIFFICULTY_COLUMNS = [
+    "proportion_plausible"
+]
+DNA_FREQUENCY_COLUMNS = ["freq_a", "freq_c", "freq_g", "freq_t"]
+
+
+def get_difficulty_labels(df: pd.DataFrame) -> np.ndarray:
     """
     difficult if:
     - avg_rfdist_plausible is close to 1.0 -> + val
     - num_topos_plausible/num_trees_plausible is close to 1.0 -> + val
     - proportion_plausible is closer to 0.0 -> + (1-val)
+
+    The label is the average over all finite values, missing and infinite values are ignored.
+    Rows without any finite value are labeled NaN.
     """
-    labels = []
-
-    for idx, row in df.iterrows():
-        diff_proba = 0
-        ct = 0
-
-        for col in [
-            "avg_rfdist_eval",
-            "avg_rfdist_plausible",
-            "num_topos_eval/num_trees_eval",
-            "num_topos_plausible/num_trees_plausible",
-        ]:
-            if (row[col] > -np.inf) and (row[col] < np.inf) and (row[col] is not None):
-                diff_proba += row[col]
-                ct += 1
-
-        for col in [
-            "proportion_plausible"
-        ]:
-            if (
-                    (row[col] > -np.inf)
-                    and (row[col] < np.inf)
-                    and (row[col] is not None)
-            ):
-                diff_proba += 1 - row[col]
-                ct += 1
-        labels.append(diff_proba / ct)
-
-    return labels
+    values = np.column_stack(
+        [df[col].to_numpy(dtype=float) for col in DIFFICULTY_COLUMNS]
+        + [1 - df[col].to_numpy(dtype=float) for col in INVERTED_DIFFICULTY_COLUMNS]
+    )
+    finite = np.isfinite(values)
 
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(finite, values, 0).sum(axis=1) / finite.sum(axis=1)
 
-if __name__ == "__main__":
-    db_path = snakemake.input.database
-    parquet_path = snakemake.output.dataframe
-    num_pars_trees = snakemake.params.num_pars_trees
-    num_rand_trees = snakemake.params.num_rand_trees
-    num_trees = num_rand_trees + num_pars_trees
-    num_parsimony_trees = snakemake.params.num_parsimony_trees
 
-    con = sqlite3.connect(db_path)
+def read_dataset_table(path: FilePath) -> pd.DataFrame:
+    """
+    Reads the dataset table of a single MSA, either from the SQLite database or from the
+    dataset.parquet file written by save_data with the parquet backend.
+    """
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
 
+    con = sqlite3.connect(path)
     df = pd.read_sql_query("SELECT * FROM dataset", con)
+    con.close()
+
+    # the packed float32 blobs are returned as arrays, as in the Parquet files
+    if "column_entropies_float32" in df.columns:
+        df["column_entropies_float32"] = [read_column_entropies(value) for value in df["column_entropies_float32"]]
+    return df
 
+
+def get_dna_frequencies(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the columns freq_a, freq_c, freq_g and freq_t with the relative frequencies of the nucleotides
+    in the char_frequencies of the given dataset table. The frequencies are NaN for AA and MORPH data
+    and for datasets without char_frequencies.
+    """
+    char_frequencies = df["char_frequencies"] if "char_frequencies" in df.columns else [None] * len(df)
+    rows = []
+    for data_type, frequencies in zip(df["data_type"], char_frequencies):
+        if isinstance(frequencies, str):
+            # JSON text in the SQLite database and the Parquet files
+            frequencies = json.loads(frequencies)
+        # missing values are None or NaN
+        if data_type != "DNA" or not isinstance(frequencies, dict):
+            rows.append([np.nan] * len(DNA_FREQUENCY_COLUMNS))
+        else:
+            rows.append([frequencies.get(c, 0.0) for c in "ACGT"])
+    return pd.DataFrame(rows, columns=DNA_FREQUENCY_COLUMNS, index=df.index, dtype=float)
+
+
+def add_derived_columns(df: pd.DataFrame, num_trees: int, num_parsimony_trees: int) -> pd.DataFrame:
+    """
+    Adds the relative number of topologies, the patterns/sites per taxon, the nucleotide frequencies
+    and the difficulty label to the given dataset table.
+    num_trees is the number of tree searches (parsimony + random starting trees).
+    """
     # fmt: off
     df["num_topos_plausible/num_trees_plausible"]   = df["num_topos_plausible"] / df["num_trees_plausible"]
     df["num_topos_parsimony/num_trees_parsimony"]   = df["num_topos_parsimony"] / num_parsimony_trees
+    # name of num_topos_parsimony/num_trees_parsimony in the Pythia paper and the feature lists in features.py
+    df["proportion_unique_topos_parsimony"]         = df["num_topos_parsimony/num_trees_parsimony"]
     df["num_topos_search/num_trees_search"]         = df["num_topos_search"] / num_trees
     df["num_topos_eval/num_trees_eval"]             = df["num_topos_eval"] / num_trees
     df["num_patterns/num_taxa"]                     = df["num_patterns"] / df["num_taxa"]
     df["num_sites/num_taxa"]                        = df["num_sites"] / df["num_taxa"]
+    df[DNA_FREQUENCY_COLUMNS] = get_dna_frequencies(df)
     df["difficult"] = get_difficulty_labels(df)
     # fmt: on
+    return df
 
-    df.to_parquet(parquet_path)
 
-    con.close()
\ No newline at end of file
+if __name__ == "__main__":
+    parquet_path = snakemake.output.dataframe
+    num_pars_trees = snakemake.params.num_pars_trees
+    num_rand_trees = snakemake.params.num_rand_trees
+    num_trees = num_rand_trees + num_pars_trees
+    num_parsimony_trees = snakemake.params.num_parsimony_trees
+
+    # either the SQLite database or the dataset.parquet file, depending on the save_data backend
+    df = read_dataset_table(snakemake.input.dataset_table)
+
+    df = add_derived_columns(df, num_trees, num_parsimony_trees)
+    df.to_parquet(parquet_path)
@@ -1,8 +1,10 @@
 from custom_types import *
+from rfdistance import get_splits_for_trees, get_topology_clusters
+from tree_set_metrics import read_trees
 from utils import read_file_contents
 from pypythia.raxmlng_parser import get_raxmlng_rfdist_results
 
-import pickle
+import numpy as np
 
 
 def get_rfdist_clusters(log_path, all_trees):
@@ -15,7 +17,7 @@ def get_rfdist_clusters(log_path, all_trees):
             continue
         # the line is a string representation of a list of ints
         # like this: [1, 2, 3, 4, ]
-        tree_ids = eval(line)
+        tree_ids = [int(id) for id in line.strip("[]").split(",") if id.strip()]
         cluster = set()
 
         for id in tree_ids:
@@ -26,13 +28,45 @@ def get_rfdist_clusters(log_path, all_trees):
     return clusters
 
 
+def get_topology_cluster_ids(eval_trees: List[Newick]) -> np.ndarray:
+    """
+    Groups the given trees by topology in-process.
+    Returns an int array with one entry per tree: the ID of the cluster of identical topologies the tree belongs to.
+    Cluster IDs are assigned in order of the first occurrence of the topology, so the first tree of
+    cluster k is the k-th unique tree.
+    """
+    cluster_ids = np.zeros(len(eval_trees), dtype=np.int64)
+    if len(eval_trees) > 1:
+        _, splits = get_splits_for_trees(eval_trees)
+        for cluster_id, tree_ids in enumerate(get_topology_clusters(splits)):
+            cluster_ids[tree_ids] = cluster_id
+    return cluster_ids
+
+
+def get_unique_trees(eval_trees: List[Newick], cluster_ids: np.ndarray) -> List[Newick]:
+    """Returns one representative tree (the first tree) for each cluster ID."""
+    _, first_occurrences = np.unique(cluster_ids, return_index=True)
+    return [eval_trees[i] for i in first_occurrences]
+
+
 def filter_tree_topologies(
         eval_trees: List[Newick],
-        log_path: FilePath,
+        log_path: FilePath = None,
 ):
+    """
+    Returns one representative tree per cluster of identical topologies and the clusters as list of sets of Newick strings.
+    If log_path is given, the clusters are read from this raxml-ng --rfdist log,
+    otherwise they are computed in-process (see get_topology_cluster_ids).
+    """
     num_trees = len(eval_trees)
 
-    if num_trees > 1:
+    if log_path is None:
+        cluster_ids = get_topology_cluster_ids(eval_trees)
+        clusters = [set() for _ in range(cluster_ids.max(initial=-1) + 1)]
+        for tree, cluster_id in zip(eval_trees, cluster_ids):
+            clusters[cluster_id].add(tree)
+
+    elif num_trees > 1:
         num_topos, _, _ = get_raxmlng_rfdist_results(log_path)
 
         if num_topos > 1:
@@ -54,17 +88,21 @@ def filter_tree_topologies(
     return unique_trees, clusters
 
 
-if __name__ == "__main__":
-    eval_trees = [l.strip() for l in open(snakemake.input.all_eval_trees).readlines()]
-    log_file = snakemake.input.eval_trees_rfdistances_log
+def write_unique_trees(trees_file: FilePath, filtered_trees_file: FilePath, clusters_file: FilePath) -> None:
+    """
+    Clusters the trees in trees_file by topology in-process and writes one representative tree per cluster
+    to filtered_trees_file and the cluster index to clusters_file (.npy).
+    The cluster index maps the index of each tree in trees_file to its cluster ID,
+    which is also the index of the tree's results in the IQ-Tree significance tests.
+    """
+    trees = read_trees(trees_file)
+    cluster_ids = get_topology_cluster_ids(trees)
 
-    unique_trees, clusters = filter_tree_topologies(
-            eval_trees=eval_trees,
-            log_path=log_file,
-    )
+    with open(filtered_trees_file, "w") as f:
+        f.write("\n".join(get_unique_trees(trees, cluster_ids)))
 
-    with open(snakemake.output.filtered_trees, "w") as f:
-        f.write("\n".join(unique_trees))
+    np.save(clusters_file, cluster_ids, allow_pickle=False)
 
-    with open(snakemake.output.clusters, "wb") as f:
-        pickle.dump(clusters, f)
\ No newline at end of file
+
+if __name__ == "__main__":
+    write_unique_trees(snakemake.input.all_eval_trees, snakemake.output.filtered_trees, snakemake.output.clusters)
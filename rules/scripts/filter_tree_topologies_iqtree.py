@@ -1,8 +1,7 @@
 from custom_types import *
 from utils import read_file_contents
 from iqtree_parser import get_iqtree_rfdist_results
-
-import pickle
+from filter_tree_topologies import write_unique_trees
 
 
 def get_rfdist_clusters(log_path, all_trees):
@@ -17,7 +16,7 @@ def get_rfdist_clusters(log_path, all_trees):
             continue
         # the line is a string representation of a list of ints
         # like this: [1, 2, 3, 4, ]
-        tree_ids = eval(line)
+        tree_ids = [int(id) for id in line.strip("[]").split(",") if id.strip()]
         cluster = set()
 
         for id in tree_ids:
@@ -58,16 +57,6 @@ def filter_tree_topologies(
 
 
 if __name__ == "__main__":
-    eval_trees = [l.strip() for l in open(snakemake.input.all_eval_trees).readlines()]
-    log_file = snakemake.input.eval_trees_rfdistances_log
-
-    unique_trees, clusters = filter_tree_topologies(
-            eval_trees=eval_trees,
-            log_path=log_file,
-    )
-
-    with open(snakemake.output.filtered_trees, "w") as f:
-        f.write("\n".join(unique_trees))
-
-    with open(snakemake.output.clusters, "wb") as f:
-        pickle.dump(clusters, f)
+    # the clustering of identical topologies does not depend on the tool that inferred the trees,
+    # so we use the same in-process clustering as filter_tree_topologies.py
+    write_unique_trees(snakemake.input.all_eval_trees, snakemake.output.filtered_trees, snakemake.output.clusters)
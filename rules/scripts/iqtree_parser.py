@@ -1,6 +1,10 @@
+import mmap
+import os
+import re
 import numpy as np
 import regex
 from tempfile import TemporaryDirectory
+from typing import NamedTuple, Optional
 import warnings
 
 from custom_types import *
@@ -11,6 +15,64 @@ from utils import (
 )
 
 from pypythia_iqtree import IQTree
+from parse_iqtree_logs import hms_to_seconds
+
+_number = rb"[-+]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?"
+
+# One scanner for all fields of an IQ-Tree log we are interested in, each alternative has a uniquely named group.
+# Used by parse_iqtree_log_record to extract all fields in a single pass over the file.
+_iqtree_log_record_re = re.compile(
+    rb"|".join(
+        [
+            rb"Optimal log-likelihood:\s*(?P<optimal_llh>" + _number + rb")",
+            rb"^BEST SCORE FOUND\s*:\s*(?P<best_score>" + _number + rb")",
+            rb"^Log-likelihood of the tree:\s*(?P<tree_llh>" + _number + rb")",
+            rb"^Log-likelihood:\s*(?P<plain_llh>" + _number + rb")",
+            rb"Initial (?:tree )?log-likelihood:\s*(?P<starting_llh>" + _number + rb")",
+            rb"^Total number of iterations:\s*(?P<total_iterations>\d+)",
+            rb"TREE SEARCH COMPLETED AFTER\s+(?P<completed_iterations>\d+)\s+ITERATIONS",
+            rb"^Number of iterations:\s*(?P<num_iterations>\d+)",
+            rb"^Total CPU time used:\s*(?P<cpu_time>" + _number + rb")",
+            rb"^Total wall-clock time used:\s*(?P<wallclock_time>" + _number + rb")\s*sec",
+            rb"/\s*Time:\s*(?P<hms_time>[0-9hms:]+)",
+            rb"^Wall-clock time used for tree search:\s*(?P<search_time>" + _number + rb")\s*sec",
+            rb"^Model of evolution:[ \t]*(?P<model>[^\r\n]+)",
+            rb"^Best-fit model:[ \t]*(?P<best_fit_model>[^\r\n]+)",
+            rb"^Command:[^\r\n]*?\s-m\s+(?P<command_model>\S+)",
+            rb"^Rate heterogeneity[^:\r\n]*:(?P<rate_het>[^\r\n]*)",
+            rb"^Base frequencies[^:\r\n]*:(?P<base_freq>[^\r\n]*)",
+            rb"^(?:Substitution rates|Rate parameters)[^:\r\n]*:(?P<subst_rates>[^\r\n]*)",
+            rb"^Alignment sites[^:\r\n]*:[^/\r\n]*/\s*(?P<patterns>\d+)",
+            rb"^Gaps[^:\r\n]*:\s*(?P<gaps>" + _number + rb")",
+            rb"^(?:Invariant|Constant) sites[^:\r\n]*:\s*(?P<invariant>" + _number + rb")",
+        ]
+    ),
+    flags=re.M,
+)
+
+# for these fields the first occurrence in the log counts, for all others the last one
+_first_occurrence_fields = {
+    "optimal_llh", "best_score", "tree_llh", "plain_llh", "starting_llh",
+    "total_iterations", "completed_iterations", "num_iterations",
+    "cpu_time", "wallclock_time", "hms_time", "search_time", "model", "best_fit_model", "command_model",
+}
+_iterations_fields = {"total_iterations", "completed_iterations", "num_iterations"}
+
+
+class IQTreeLogRecord(NamedTuple):
+    """All values we use from a single IQ-Tree inference or evaluation log. Fields not present in the log are None."""
+    llh: Optional[float]
+    starting_llh: Optional[float]
+    num_iterations: Optional[int]
+    runtime: Optional[float]
+    cpu_time: Optional[float]
+    model: Optional[str]
+    rate_het: Optional[str]
+    base_freq: Optional[str]
+    subst_rates: Optional[str]
+    patterns: Optional[int]
+    gaps: Optional[float]
+    invariant: Optional[float]
 
 
 def get_iqtree_llh(iqtree_file: FilePath) -> float:
@@ -135,6 +197,60 @@ def get_iqtree_num_iterations(log_file: FilePath) -> Tuple[int, int]:
     return num_iterations, 0
 
 
+def parse_iqtree_log_record(log_file: FilePath) -> IQTreeLogRecord:
+    """
+    Parses all values we use from the given IQ-Tree log in a single memory-mapped pass over the file.
+
+    The final log-likelihood is the first "Optimal log-likelihood", falling back to "BEST SCORE FOUND",
+    "Log-likelihood of the tree" and "Log-likelihood" (as in parse_iqtree_logs.parse_iqtree_log).
+    The runtime is the wall-clock time, the number of iterations the first iteration count in the log
+    (as in get_iqtree_num_iterations). Model parameters, patterns, gaps and invariant sites are parsed
+    as in get_model_parameter_estimates and get_patterns_gaps_invariant.
+    Gaps and invariant sites are returned as proportions.
+    """
+    found = {}
+
+    if os.path.getsize(log_file) > 0:
+        with open(log_file, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+            for m in _iqtree_log_record_re.finditer(content):
+                field = m.lastgroup
+                if field in _iterations_fields:
+                    if "iterations" not in found:
+                        found["iterations"] = m.group(field)
+                elif field not in _first_occurrence_fields or field not in found:
+                    found[field] = m.group(field)
+
+    def _get(*fields, convert=lambda v: v.decode().strip()):
+        for field in fields:
+            if field in found:
+                return convert(found[field])
+        return None
+
+    runtime = _get("wallclock_time", convert=float)
+    if runtime is None:
+        runtime = _get("hms_time", convert=lambda v: hms_to_seconds(v.decode()))
+    if runtime is None:
+        runtime = _get("search_time", convert=float)
+
+    gaps = _get("gaps", convert=float)
+    invariant = _get("invariant", convert=float)
+
+    return IQTreeLogRecord(
+        llh=_get("optimal_llh", "best_score", "tree_llh", "plain_llh", convert=float),
+        starting_llh=_get("starting_llh", convert=float),
+        num_iterations=_get("iterations", convert=int),
+        runtime=runtime,
+        cpu_time=_get("cpu_time", convert=float),
+        model=_get("model", "best_fit_model", "command_model"),
+        rate_het=_get("rate_het"),
+        base_freq=_get("base_freq"),
+        subst_rates=_get("subst_rates"),
+        patterns=_get("patterns", convert=int),
+        gaps=gaps / 100.0 if gaps is not None else None,
+        invariant=invariant / 100.0 if invariant is not None else None,
+    )
+
+
 def rel_rfdistance_starting_final(
     newick_starting: Newick,
     newick_final: Newick,
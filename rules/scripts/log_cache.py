@@ -0,0 +1,173 @@
+import concurrent.futures
+import hashlib
+import inspect
+import multiprocessing
+import os
+import pickle
+import sqlite3
+import types
+
+from custom_types import *
+
+# result of _lookup if there is no valid cache entry, None is a valid parser result
+_MISSING = object()
+
+
+class ParsedLogCache:
+    """
+    On-disk cache for the results of the log parsers (iqtree_parser, raxmlng_parser, parse_iqtree_logs, ...).
+
+    The results are stored in a SQLite sidecar file, one row per (parser, log file).
+    An entry is only reused if the size and modification time of the log file are unchanged and the sources
+    of the module defining the parser and of the helper modules it uses (see _get_source_files) are unchanged,
+    otherwise the log is parsed again and the entry is replaced.
+    Only use parsers whose result depends solely on the content of the given log file.
+
+    parse_many parses the logs missing in the cache in a pool of num_workers processes,
+    the parser therefore has to be a module level function. The workers are forked where available:
+    under spawn and forkserver, each worker re-imports the main module, which fails for scripts without
+    a __main__ guard such as the snakemake scripts.
+
+    Usage:
+        with ParsedLogCache(cache_file, num_workers=4) as cache:
+            llhs = cache.parse(get_all_iqtree_llhs, log_file)
+            records = cache.parse_many(parse_iqtree_log_record, log_files)
+    """
+
+    def __init__(self, cache_file: FilePath, num_workers: int = 1):
+        self.cache_file = cache_file
+        self.num_workers = max(1, num_workers)
+        self._executor = None
+        self._parser_versions = {}
+        self._conn = sqlite3.connect(cache_file)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS parsed_logs ("
+            "parser TEXT NOT NULL, "
+            "path TEXT NOT NULL, "
+            "size INTEGER NOT NULL, "
+            "mtime_ns INTEGER NOT NULL, "
+            "parser_version TEXT NOT NULL, "
+            "result BLOB NOT NULL, "
+            "PRIMARY KEY (parser, path))"
+        )
+        self._conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self._conn.commit()
+        self._conn.close()
+
+    def _get_parser_version(self, parser: Callable) -> str:
+        # hash of the sources of the module defining the parser and of the helper modules it uses,
+        # changes to the parser or its helpers invalidate its entries
+        name = _get_parser_name(parser)
+        if name not in self._parser_versions:
+            version = hashlib.sha1()
+            for source_file in _get_source_files(inspect.getmodule(parser)):
+                with open(source_file, "rb") as f:
+                    version.update(hashlib.sha1(f.read()).digest())
+            self._parser_versions[name] = version.hexdigest()
+        return self._parser_versions[name]
+
+    def _lookup(self, parser: Callable, log_file: FilePath):
+        """
+        Returns (key, result) with result being _MISSING if there is no valid cache entry for the log file,
+        parsers may return None. The key is passed to _store to add the parsed result to the cache.
+        """
+        path = os.path.abspath(log_file)
+        stat = os.stat(path)
+        key = (_get_parser_name(parser), path, stat.st_size, stat.st_mtime_ns, self._get_parser_version(parser))
+
+        row = self._conn.execute(
+            "SELECT size, mtime_ns, parser_version, result FROM parsed_logs WHERE parser = ? AND path = ?",
+            key[:2],
+        ).fetchone()
+        if row is not None and tuple(row[:3]) == key[2:]:
+            return key, pickle.loads(row[3])
+        return key, _MISSING
+
+    def _store(self, key, result) -> None:
+        self._conn.execute("INSERT OR REPLACE INTO parsed_logs VALUES (?, ?, ?, ?, ?, ?)", (*key, pickle.dumps(result)))
+
+    def parse(self, parser: Callable, log_file: FilePath):
+        """
+        Returns parser(log_file), reusing the cached result if the log file and parser did not change.
+        Exceptions raised by the parser are not cached.
+        """
+        key, result = self._lookup(parser, log_file)
+        if result is _MISSING:
+            result = parser(log_file)
+            self._store(key, result)
+        return result
+
+    def parse_many(self, parser: Callable, log_files: List[FilePath]) -> List:
+        """
+        Returns [parser(log_file) for log_file in log_files], in the order of the given log files.
+        Cached results are reused, the remaining logs are parsed in parallel in a pool of num_workers processes.
+        """
+        results = []
+        missing = []
+        for i, log_file in enumerate(log_files):
+            key, result = self._lookup(parser, log_file)
+            results.append(result)
+            if result is _MISSING:
+                missing.append((i, key))
+
+        if len(missing) > 1 and self.num_workers > 1:
+            if self._executor is None:
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.num_workers, mp_context=_get_mp_context()
+                )
+            # map returns the results in the order of the submitted logs
+            chunksize = max(1, len(missing) // (4 * self.num_workers))
+            parsed = self._executor.map(parser, [log_files[i] for i, _ in missing], chunksize=chunksize)
+        else:
+            parsed = map(parser, [log_files[i] for i, _ in missing])
+
+        for (i, key), result in zip(missing, parsed):
+            results[i] = result
+            self._store(key, result)
+
+        return results
+
+
+def _get_source_files(module: types.ModuleType) -> List[str]:
+    """
+    Returns the sorted source files of the given module and of all modules in the same directory
+    it uses (e.g. utils.py for the parsers in rules/scripts), directly or through other such modules.
+    """
+    directory = os.path.dirname(os.path.abspath(inspect.getsourcefile(module)))
+    source_files = set()
+    modules = [module]
+    while modules:
+        module = modules.pop()
+        source_file = os.path.abspath(inspect.getsourcefile(module))
+        if source_file in source_files:
+            continue
+        source_files.add(source_file)
+        # imported modules and names imported from other modules (from utils import ...)
+        for value in vars(module).values():
+            used_module = value if isinstance(value, types.ModuleType) else inspect.getmodule(value)
+            used_file = getattr(used_module, "__file__", None)
+            if used_file and os.path.dirname(os.path.abspath(used_file)) == directory:
+                modules.append(used_module)
+    return sorted(source_files)
+
+
+def _get_mp_context():
+    # fork on POSIX regardless of the default start method (spawn on macOS, forkserver on Linux from Python 3.14)
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return None
+
+
+def _get_parser_name(parser: Callable) -> str:
+    return f"{parser.__module__}.{parser.__qualname__}"
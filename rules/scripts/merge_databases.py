@@ -0,0 +1,65 @@
+import sys
+
+from database import *
+
+from custom_types import *
+
+
+def _read_rows(source: P.SqliteDatabase, model: Type[P.Model], *where) -> List[Dict]:
+    # only the columns present in the source database are read, databases with an older schema can be merged as well
+    columns = {column.name for column in source.get_columns(model._meta.table_name)}
+    fields = [field for field in model._meta.sorted_fields if field.column_name in columns]
+    with source.bind_ctx([model]):
+        query = model.select(*fields)
+        if where:
+            query = query.where(*where)
+        return list(query.dicts())
+
+
+def merge_databases(store_file: FilePath, database_files: List[FilePath], replace: bool = False) -> Tuple[int, int]:
+    """
+    Merges the datasets of the given databases (e.g. the data.sqlite3 databases of the individual MSAs)
+    into the database at store_file, see upsert_dataset. Datasets whose content_hash is already
+    in the store are skipped, so merging the databases of a rerun only inserts the new and changed datasets.
+    Returns the number of inserted and skipped datasets.
+    """
+    migrate_database(store_file)
+    db.init(store_file)
+    db.connect()
+
+    num_inserted = num_skipped = 0
+    for database_file in database_files:
+        source = P.SqliteDatabase(database_file)
+        source.connect()
+
+        for dataset_row in _read_rows(source, Dataset):
+            dataset_id = dataset_row.pop("id")
+            content_hash = dataset_row.get("content_hash")
+            if not replace and content_hash and Dataset.select().where(Dataset.content_hash == content_hash).exists():
+                num_skipped += 1
+                continue
+
+            rows = {}
+            for model in MODELS:
+                if model is Dataset or not source.table_exists(model._meta.table_name):
+                    continue
+                model_rows = _read_rows(source, model, model.dataset == dataset_id)
+                for row in model_rows:
+                    del row["id"], row["dataset"]
+                rows[model] = model_rows
+
+            upsert_dataset(dataset_row, rows, replace=replace)
+            num_inserted += 1
+
+        source.close()
+
+    db.close()
+    return num_inserted, num_skipped
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: merge_databases.py <store_file> <database_file> [<database_file> ...]")
+        sys.exit(1)
+    num_inserted, num_skipped = merge_databases(sys.argv[1], sys.argv[2:])
+    print(f"Inserted {num_inserted} datasets into {sys.argv[1]}, skipped {num_skipped} unchanged datasets")
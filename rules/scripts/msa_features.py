@@ -0,0 +1,385 @@
+"""
+Feature kernel for the MSA features in msa_features.json. The alignment is read once into a uint8 matrix
+(taxa x sites, ASCII codes) and the number of occurrences of each character per site is counted once, sequence by sequence.
+All features except the number of patterns and the Bollback multinomial are derived from these counts,
+the patterns are determined by hashing the sites block by block. The treelikeness score is computed on the pairwise
+distances of the one-hot encoded alignment, see get_pairwise_distances.
+
+The characters are upper case, all gap characters (-?.X* and N for DNA data) are replaced by "-" and U is replaced by T
+for DNA data as in pypythia.
+"""
+import itertools
+import math
+from typing import NamedTuple
+
+import numpy as np
+
+from custom_types import *
+from msa_sniffer import GAP_CHARS, MORPH_STATES, get_data_type
+
+GAP = ord("-")
+
+# unambiguous states of each data type
+STATES = {
+    "DNA": b"ACGT",
+    "AA": b"ACDEFGHIKLMNPQRSTVWY",
+    "MORPH": MORPH_STATES,
+}
+
+AMBIGUITY_CODES = {
+    "DNA": {
+        b"R": b"AG",
+        b"K": b"GT",
+        b"S": b"GC",
+        b"Y": b"CT",
+        b"M": b"AC",
+        b"W": b"AT",
+        b"B": b"CGT",
+        b"H": b"ACT",
+        b"D": b"AGT",
+        b"V": b"ACG",
+    },
+    "AA": {
+        b"B": b"DN",
+        b"Z": b"EQ",
+    },
+    "MORPH": {},
+}
+
+# upper bound for the number of entries of the one-hot encoded blocks of sites in get_pairwise_distances
+DISTANCE_BLOCK_ENTRIES = 2**24
+
+# upper bound for the number of characters of the blocks of sites hashed at once in get_pattern_counts
+PATTERN_BLOCK_ENTRIES = 2**24
+
+# the treelikeness score is the mean over all quartets of taxa or over this many randomly sampled quartets
+TREELIKENESS_QUARTETS = 10000
+
+_upper_case = np.arange(256, dtype=np.uint8)
+_upper_case[ord("a"): ord("z") + 1] -= 32
+
+
+class Alignment(NamedTuple):
+    taxa: List[str]
+    # taxa x sites matrix of upper case ASCII codes with the gap characters replaced by "-" and U by T for DNA data
+    sequences: np.ndarray
+    data_type: str
+
+
+def _iter_sequence_chunks(msa_file: FilePath) -> Iterator[Tuple[int, Optional[str], bytes]]:
+    """
+    Reads the given FASTA or PHYLIP (sequential or interleaved) file line by line and yields the index of the taxon,
+    the taxon name and the first part of the sequence when a taxon first occurs, and the index of the taxon,
+    None and the following parts of its sequence afterwards.
+    """
+    with open(msa_file, "rb") as f:
+        lines = (fields for fields in map(bytes.split, f) if fields)
+        first_line = next(lines, None)
+
+        if first_line is None:
+            raise ValueError(f"The given MSA {msa_file} is empty.")
+
+        if first_line[0].startswith(b">"):
+            index = 0
+            yield index, b" ".join(first_line).decode()[1:].strip(), b""
+            for fields in lines:
+                if fields[0].startswith(b">"):
+                    index += 1
+                    yield index, b" ".join(fields).decode()[1:].strip(), b""
+                else:
+                    yield index, None, b"".join(fields)
+            return
+
+        try:
+            num_taxa, num_sites = map(int, first_line[:2])
+        except ValueError:
+            raise ValueError(
+                f"The file type of {msa_file} could not be determined. "
+                f"Please check that the file contains data in phylip or fasta format."
+            )
+        # the first block contains the taxon names, the following blocks of interleaved files only the sequences
+        lengths = [0] * num_taxa
+        for i, fields in enumerate(lines):
+            index = i % num_taxa
+            data = b"".join(fields[1:] if i < num_taxa else fields)
+            lengths[index] += len(data)
+            yield index, fields[0].decode() if i < num_taxa else None, data
+
+        if any(length != num_sites for length in lengths):
+            raise ValueError(f"The sequences in {msa_file} do not have the length {num_sites} given in the header.")
+
+
+def _get_normalization(characters: Set[int], msa_file: FilePath) -> Tuple[str, np.ndarray]:
+    # returns the data type for the given ASCII codes and the lookup table converting the characters
+    # to upper case, the gap characters to "-" and U to T for DNA data
+    data_type = get_data_type(set(_upper_case[list(characters)].tolist()), msa_file)
+    lookup = _upper_case.copy()
+    gap_chars = GAP_CHARS | {ord("N")} if data_type == "DNA" else GAP_CHARS
+    for c in gap_chars:
+        lookup[c] = lookup[ord(chr(c).lower())] = GAP
+    if data_type == "DNA":
+        lookup[ord("U")] = lookup[ord("u")] = ord("T")
+    return data_type, lookup
+
+
+def read_alignment(msa_file: FilePath) -> Alignment:
+    """
+    Reads the given FASTA or PHYLIP (sequential or interleaved) file into an Alignment.
+
+    Raises:
+        ValueError: If the file is neither in FASTA nor in PHYLIP format, the sequences differ in length
+            or the data type cannot be inferred from the characters.
+    """
+    taxa, sequences = [], []
+    for index, taxon, data in _iter_sequence_chunks(msa_file):
+        if taxon is not None:
+            taxa.append(taxon)
+            sequences.append([])
+        sequences[index].append(data)
+    sequences = [b"".join(sequence) for sequence in sequences]
+
+    if len({len(sequence) for sequence in sequences}) != 1:
+        raise ValueError(f"The sequences in {msa_file} differ in length.")
+
+    sequences = np.frombuffer(b"".join(sequences), dtype=np.uint8).reshape(len(taxa), -1)
+    data_type, lookup = _get_normalization(set(_get_characters(sequences).tolist()), msa_file)
+    # upper case and gap characters in a single lookup
+    return Alignment(taxa, lookup[sequences], data_type)
+
+
+def _get_characters(sequences: np.ndarray) -> np.ndarray:
+    occurrences = np.zeros(256, dtype=np.int64)
+    for sequence in sequences:
+        occurrences += np.bincount(sequence, minlength=256)
+    return np.flatnonzero(occurrences)
+
+
+def get_state_counts(sequences: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the characters (ASCII codes) occurring in the given alignment matrix and their number of occurrences per site
+    as (characters x sites) matrix. The alignment is traversed once, one sequence at a time.
+    """
+    num_sites = sequences.shape[1]
+    characters = _get_characters(sequences)
+
+    index = np.zeros(256, dtype=np.intp)
+    index[characters] = np.arange(len(characters))
+    counts = np.zeros((len(characters), num_sites), dtype=np.int32)
+    sites = np.arange(num_sites)
+    for sequence in sequences:
+        # each site occurs once per sequence, so there are no duplicate indices
+        counts[index[sequence], sites] += 1
+
+    return characters.astype(np.uint8), counts
+
+
+def get_char_frequencies(characters: np.ndarray, counts: np.ndarray) -> Dict[str, float]:
+    """Relative frequency of each character in the alignment, gaps are ignored. Keys are sorted by character."""
+    totals = counts.sum(axis=1)
+    states = characters != GAP
+    num_chars = totals[states].sum()
+    return {
+        chr(c): float(total / num_chars)
+        for c, total in zip(characters[states].tolist(), totals[states].tolist())
+    }
+
+
+def get_column_entropies(characters: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Shannon entropy (log2) of the characters of each site, gaps are ignored. Full gap sites have entropy 0."""
+    counts = counts[characters != GAP].astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        probabilities = counts / counts.sum(axis=0)
+        terms = np.where(counts > 0, probabilities * np.log2(probabilities), 0.0)
+    return 0.0 - terms.sum(axis=0)
+
+
+def get_pattern_counts(sequences: np.ndarray, block_entries: int = PATTERN_BLOCK_ENTRIES) -> np.ndarray:
+    """
+    Returns the number of occurrences of each distinct site (site pattern) of the given alignment matrix.
+    The sites are hashed in blocks of at most block_entries characters and the counts of the blocks are merged,
+    only one block of a memory mapped alignment is copied into memory at a time.
+    """
+    num_taxa, num_sites = sequences.shape
+    block_size = max(1, block_entries // max(1, num_taxa))
+    # each site is hashed as one opaque value of num_taxa bytes
+    site_type = np.dtype((np.void, num_taxa))
+
+    pattern_counts = {}
+    for start in range(0, num_sites, block_size):
+        sites = np.ascontiguousarray(sequences[:, start: start + block_size].T).view(site_type).ravel()
+        patterns, counts = np.unique(sites, return_counts=True)
+        for pattern, count in zip(patterns.tolist(), counts.tolist()):
+            pattern_counts[pattern] = pattern_counts.get(pattern, 0) + count
+
+    return np.fromiter(pattern_counts.values(), dtype=np.int64, count=len(pattern_counts))
+
+
+def get_bollback_multinomial(pattern_counts: np.ndarray) -> float:
+    """
+    Bollback multinomial: sum of N_i * log(N_i) over all site patterns i with N_i occurrences, minus n * log(n).
+    pattern_counts is the result of get_pattern_counts.
+    """
+    num_sites = pattern_counts.sum()
+    return float(np.sum(pattern_counts * np.log(pattern_counts)) - num_sites * np.log(num_sites))
+
+
+def _get_constant_sites(characters: np.ndarray, counts: np.ndarray, data_type: str) -> np.ndarray:
+    # a site is constant if there is a state that is compatible with all of its characters, gaps are compatible
+    # with all states and ambiguous characters with each of their states, full gap sites are constant
+    states = STATES[data_type]
+    ambiguity_codes = {ord(code): set(resolved) for code, resolved in AMBIGUITY_CODES[data_type].items()}
+    compatible = np.zeros((len(characters), len(states)), dtype=bool)
+    for i, c in enumerate(characters.tolist()):
+        if c in states:
+            compatible[i] = np.frombuffer(states, dtype=np.uint8) == c
+        elif c in ambiguity_codes:
+            compatible[i] = [state in ambiguity_codes[c] for state in states]
+        else:
+            # gaps and unknown characters
+            compatible[i] = True
+
+    # number of incompatible characters for each state and site
+    incompatible = (~compatible).T.astype(np.int32) @ (counts > 0).astype(np.int32)
+    return np.any(incompatible == 0, axis=0)
+
+
+def get_patterns_gaps_invariant(
+    alignment: Alignment,
+    tool: str = "iqtree",
+    characters: Optional[np.ndarray] = None,
+    counts: Optional[np.ndarray] = None,
+    pattern_counts: Optional[np.ndarray] = None,
+) -> Tuple[int, float, float]:
+    """
+    Computes the number of patterns, proportion of gaps, and proportion of invariant sites of the given alignment
+    as reported by the given tool when loading the alignment (see get_patterns_gaps_invariant of pypythia_iqtree
+    and pypythia.raxmlng) without running it. Gap characters (see GAP_CHARS) are one unknown state.
+
+        iqtree: patterns are the distinct sites, gaps the proportion of gap and ambiguous characters
+            (Gap/Ambiguity) and invariant the proportion of constant sites. Full gap sites are included.
+        raxml-ng: full gap sites are removed, patterns are the distinct remaining sites, gaps the proportion
+            of gap characters and invariant the proportion of invariant sites.
+
+    Ambiguous characters are resolved to their states for the invariant sites.
+    characters and counts are the result of get_state_counts and pattern_counts the result of get_pattern_counts,
+    they are computed if not given.
+    """
+    if tool not in ["iqtree", "raxml-ng"]:
+        raise ValueError(f"Unknown tool {tool}, use 'iqtree' or 'raxml-ng'.")
+    if characters is None or counts is None:
+        characters, counts = get_state_counts(alignment.sequences)
+    if pattern_counts is None:
+        pattern_counts = get_pattern_counts(alignment.sequences)
+
+    num_taxa = alignment.sequences.shape[0]
+    gap_counts = counts[characters == GAP].sum(axis=0)
+    full_gap = gap_counts == num_taxa
+    constant = _get_constant_sites(characters, counts, alignment.data_type)
+
+    if tool == "iqtree":
+        ambiguous = ~np.isin(characters, list(STATES[alignment.data_type]))
+        gaps = counts[ambiguous].sum() / counts.sum()
+        return len(pattern_counts), float(gaps), float(constant.mean())
+
+    num_full_gap = int(full_gap.sum())
+    num_sites = len(full_gap) - num_full_gap
+    if num_sites == 0:
+        return 0, 1.0, 0.0
+    # the full gap site is one of the patterns if there are full gap sites
+    num_patterns = len(pattern_counts) - (num_full_gap > 0)
+    gaps = gap_counts[~full_gap].sum() / (num_taxa * num_sites)
+    return num_patterns, float(gaps), float(constant[~full_gap].mean())
+
+
+def get_pairwise_distances(sequences: np.ndarray, block_entries: int = DISTANCE_BLOCK_ENTRIES) -> np.ndarray:
+    """
+    Returns the (taxa x taxa) matrix of the identity distances of all pairs of sequences, i.e. the proportion of sites
+    with different characters, as computed by Biopython's DistanceCalculator("identity").
+    The number of identical characters of all pairs is the product of the one-hot encoded alignment with its transpose.
+    The sites are processed in blocks, the one-hot encoding of a block has at most block_entries entries.
+    """
+    num_taxa, num_sites = sequences.shape
+    characters = _get_characters(sequences)
+    block_size = max(1, block_entries // max(1, num_taxa))
+
+    matches = np.zeros((num_taxa, num_taxa), dtype=np.float64)
+    for start in range(0, num_sites, block_size):
+        block = sequences[:, start: start + block_size]
+        for c in characters:
+            # float32 counts are exact up to 2**24 sites per block
+            one_hot = (block == c).astype(np.float32)
+            matches += one_hot @ one_hot.T
+
+    return 1.0 - matches / num_sites
+
+
+def _get_quartets(num_taxa: int, num_quartets: int, seed: int) -> np.ndarray:
+    if math.comb(num_taxa, 4) <= num_quartets:
+        return np.array(list(itertools.combinations(range(num_taxa), 4)))
+
+    rng = np.random.default_rng(seed)
+    quartets = np.empty((0, 4), dtype=np.int64)
+    while len(quartets) < num_quartets:
+        sample = np.sort(rng.integers(0, num_taxa, size=(num_quartets, 4)), axis=1)
+        # only keep quartets of four distinct taxa
+        sample = sample[np.all(sample[:, 1:] != sample[:, :-1], axis=1)]
+        quartets = np.concatenate([quartets, sample])
+    return quartets[:num_quartets]
+
+
+def get_treelikeness_score(
+    distances: np.ndarray, num_quartets: int = TREELIKENESS_QUARTETS, seed: int = 0
+) -> Optional[float]:
+    """
+    Returns the mean delta score (Holland et al. 2002) of the quartets of taxa for the given distance matrix.
+    For a quartet a, b, c, d with the sums of distances m1 >= m2 >= m3 of d(a,b) + d(c,d), d(a,c) + d(b,d) and
+    d(a,d) + d(b,c), the delta score is (m1 - m2) / (m1 - m3), and 0 if m1 == m3. Lower scores are more tree-like.
+    If the number of quartets exceeds num_quartets, num_quartets random quartets are used.
+    Returns None for less than 4 taxa.
+    """
+    num_taxa = distances.shape[0]
+    if num_taxa < 4:
+        return None
+
+    a, b, c, d = _get_quartets(num_taxa, num_quartets, seed).T
+    sums = np.sort(
+        np.stack([distances[a, b] + distances[c, d], distances[a, c] + distances[b, d], distances[a, d] + distances[b, c]]),
+        axis=0,
+    )
+    m3, m2, m1 = sums
+    with np.errstate(divide="ignore", invalid="ignore"):
+        delta = np.where(m1 > m3, (m1 - m2) / (m1 - m3), 0.0)
+    return float(delta.mean())
+
+
+def get_msa_features(
+    alignment: Alignment,
+    tool: str = "iqtree",
+    patterns_gaps_invariant: Optional[Tuple[int, float, float]] = None,
+) -> Dict:
+    """
+    Returns the features of msa_features.json for the given alignment.
+    The number of patterns, gaps and invariant sites are computed as reported by the given tool,
+    see get_patterns_gaps_invariant, unless they are given as patterns_gaps_invariant (e.g. from the log of the tool).
+    """
+    characters, counts = get_state_counts(alignment.sequences)
+    # the sites are hashed once for the number of patterns and the Bollback multinomial
+    pattern_counts = get_pattern_counts(alignment.sequences)
+    column_entropies = get_column_entropies(characters, counts)
+    if patterns_gaps_invariant is None:
+        patterns_gaps_invariant = get_patterns_gaps_invariant(alignment, tool, characters, counts, pattern_counts)
+    patterns, gaps, invariant = patterns_gaps_invariant
+    num_taxa, num_sites = alignment.sequences.shape
+
+    return {
+        "taxa": num_taxa,
+        "sites": num_sites,
+        "patterns": patterns,
+        "gaps": gaps,
+        "invariant": invariant,
+        "entropy": float(np.mean(column_entropies)),
+        "column_entropies": column_entropies.tolist(),
+        "bollback": get_bollback_multinomial(pattern_counts),
+        "char_frequencies": get_char_frequencies(characters, counts),
+        "treelikeness": get_treelikeness_score(get_pairwise_distances(alignment.sequences)),
+    }
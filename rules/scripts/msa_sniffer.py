@@ -0,0 +1,174 @@
+"""
+Lightweight detection of the data type and the RAxML-NG model of MSA files for building the snakemake DAG.
+Instead of parsing the whole alignment into a pypythia MSA object, only the characters of a sample of the sequences
+are inspected. The results are cached in a JSON manifest keyed by the hash of the MSA file, see MSAManifest.
+The rules follow pypythia: MSAs with digits are morphological data, MSAs with only DNA characters DNA data
+and MSAs with only amino acid characters AA data.
+"""
+import hashlib
+import inspect
+import json
+import os
+import sys
+from typing import NamedTuple
+
+from custom_types import *
+from utils import get_file_hash
+
+GAP_CHARS = frozenset(b"-?.X*")
+DNA_CHARS = frozenset(b"ACGTU" + b"RKSYMWBHDV" + b"N") | GAP_CHARS
+AA_CHARS = frozenset(b"ACDEFGHIKLMNPQRSTVWY" + b"BZ") | GAP_CHARS
+# morphological states in RAxML-NG order: 0-9, then A-V for the states 10-31
+MORPH_STATES = b"0123456789ABCDEFGHIJKLMNOPQRSTUV"
+
+# number of sequences inspected to determine the data type
+SNIFF_SEQUENCES = 100
+
+
+class MSAMetadata(NamedTuple):
+    data_type: str
+    raxmlng_model: str
+
+
+def _get_sequence_lines(msa_file: FilePath) -> Iterator[bytes]:
+    # yields the sequence data (without taxon names) of the given FASTA or PHYLIP file line by line,
+    # one sequence per line for FASTA files and sequential PHYLIP files and the first block of interleaved PHYLIP files
+    with open(msa_file, "rb") as f:
+        first_line = f.readline().strip()
+
+        if first_line.startswith(b">"):
+            for line in f:
+                if not line.startswith(b">"):
+                    yield line.strip()
+            return
+
+        try:
+            num_taxa, _num_sites = map(int, first_line.split()[:2])
+        except ValueError:
+            raise ValueError(
+                f"The file type of {msa_file} could not be determined. "
+                f"Please check that the file contains data in phylip or fasta format."
+            )
+
+        # the first num_taxa lines start with the taxon name
+        num_named = 0
+        for line in f:
+            fields = line.split()
+            if not fields:
+                continue
+            if num_named < num_taxa:
+                num_named += 1
+                yield b"".join(fields[1:])
+            else:
+                yield b"".join(fields)
+
+
+def get_data_type(characters: Set[int], msa_file: FilePath) -> str:
+    """
+    Returns the data type (DNA, AA or MORPH) of an MSA with the given (upper case) characters as ASCII codes.
+
+    Raises:
+        ValueError: If the characters are neither valid DNA nor AA characters.
+    """
+    if any(chr(c).isdigit() for c in characters):
+        return "MORPH"
+    if characters <= DNA_CHARS:
+        return "DNA"
+    if characters <= AA_CHARS:
+        return "AA"
+    raise ValueError(
+        f"Data type of {msa_file} could not be inferred from the characters {''.join(sorted(map(chr, characters)))}."
+    )
+
+
+def _get_characters(lines: Iterator[bytes]) -> Set[int]:
+    characters = set()
+    for line in lines:
+        characters.update(line.upper())
+    return characters
+
+
+def sniff_msa(msa_file: FilePath, num_sequences: int = SNIFF_SEQUENCES) -> MSAMetadata:
+    """
+    Returns the data type (DNA, AA or MORPH) and the RAxML-NG model of the given MSA file.
+    The data type is determined from the first num_sequences sequences (lines of sequence data).
+    For morphological data, all sequences are read since the model depends on the largest state in the alignment.
+
+    Raises:
+        ValueError: If the file is neither in FASTA nor in PHYLIP format or contains invalid characters.
+    """
+    lines = _get_sequence_lines(msa_file)
+    characters = _get_characters(line for _, line in zip(range(num_sequences), lines))
+    data_type = get_data_type(characters, msa_file)
+
+    if data_type == "DNA":
+        return MSAMetadata(data_type, "GTR+G")
+    if data_type == "AA":
+        return MSAMetadata(data_type, "LG+G")
+
+    characters.update(_get_characters(lines))
+    num_states = max(MORPH_STATES.index(c) for c in characters if c in MORPH_STATES) + 1
+    return MSAMetadata(data_type, f"MULTI{num_states}_GTR")
+
+
+class MSAManifest:
+    """
+    JSON manifest caching the results of sniff_msa for the MSA files of the pipeline.
+
+    An entry is reused without reading the MSA if the size and modification time of the file are unchanged.
+    Otherwise, the hash of the file is compared: renamed, copied or touched MSAs with the same content
+    are not sniffed again. All entries are invalidated if the source of this module changes.
+
+    Usage:
+        with MSAManifest(manifest_file) as manifest:
+            data_type, raxmlng_model = manifest.get(msa_file)
+    """
+
+    def __init__(self, manifest_file: FilePath):
+        self.manifest_file = manifest_file
+        self.version = hashlib.sha1(inspect.getsource(sys.modules[__name__]).encode()).hexdigest()
+        self._files = {}
+        self._hashes = {}
+        self._changed = False
+
+        if os.path.isfile(manifest_file):
+            with open(manifest_file) as f:
+                manifest = json.load(f)
+            if manifest.get("version") == self.version:
+                self._files = manifest["files"]
+                self._hashes = {entry["sha256"]: entry for entry in self._files.values()}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.save()
+
+    def get(self, msa_file: FilePath) -> MSAMetadata:
+        path = os.path.abspath(msa_file)
+        stat = os.stat(path)
+        entry = self._files.get(path)
+
+        if entry is None or entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+            file_hash = get_file_hash(path)
+            cached = self._hashes.get(file_hash)
+            metadata = MSAMetadata(cached["data_type"], cached["raxmlng_model"]) if cached else sniff_msa(path)
+            entry = dict(size=stat.st_size, mtime_ns=stat.st_mtime_ns, sha256=file_hash, **metadata._asdict())
+            self._files[path] = entry
+            self._hashes[file_hash] = entry
+            self._changed = True
+
+        return MSAMetadata(entry["data_type"], entry["raxmlng_model"])
+
+    def save(self) -> None:
+        if not self._changed:
+            return
+        directory = os.path.dirname(self.manifest_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # write to a temporary file first, concurrent snakemake invocations never read a partial manifest
+        tmp_file = f"{self.manifest_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(dict(version=self.version, files=self._files), f)
+        os.replace(tmp_file, self.manifest_file)
+        self._changed = False
@@ -0,0 +1,39 @@
+import re
+import zlib
+
+from custom_types import *
+
+# taxon labels follow an opening bracket or comma and end at the branch length, the next comma or a closing bracket
+_taxon_label_re = re.compile(r"[(,]\s*([^(),:;\[\]]+)")
+
+# zlib only uses the last 32KB of the preset dictionary
+_MAX_DICTIONARY_SIZE = 32 * 1024
+
+COMPRESSION_LEVEL = 9
+
+
+def get_newick_dictionary(newick_strs: List[Newick]) -> bytes:
+    """
+    Returns the preset dictionary for compress_newick built from the taxon labels of the given trees.
+    All trees of a dataset share the taxa, so the labels are the recurring content of the Newick strings.
+    """
+    labels = set()
+    for newick in newick_strs:
+        labels.update(label.strip() for label in _taxon_label_re.findall(newick))
+
+    dictionary = ",".join(sorted(labels)).encode()
+    return dictionary[-_MAX_DICTIONARY_SIZE:]
+
+
+def compress_newick(newick: Newick, dictionary: Optional[bytes] = None) -> bytes:
+    """
+    Compresses the given Newick string with zlib, using the given preset dictionary (see get_newick_dictionary).
+    The same dictionary is required to decompress the tree with decompress_newick.
+    """
+    compressor = zlib.compressobj(COMPRESSION_LEVEL, zdict=dictionary) if dictionary else zlib.compressobj(COMPRESSION_LEVEL)
+    return compressor.compress(newick.encode()) + compressor.flush()
+
+
+def decompress_newick(data: bytes, dictionary: Optional[bytes] = None) -> Newick:
+    decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+    return (decompressor.decompress(data) + decompressor.flush()).decode()
@@ -0,0 +1,83 @@
+import json
+
+import numpy as np
+import peewee as P
+import pyarrow as pa
+import pyarrow.parquet as pq
+from playhouse.sqlite_ext import JSONField
+
+from custom_types import *
+from database import Float32ArrayField
+
+# Arrow types for the peewee field types, JSON and UUID fields are stored as text as in the SQLite database
+# Float32ArrayFields are stored as list<float32> column instead of the packed blob
+_ARROW_TYPES = {
+    "AUTO": pa.int64(),
+    "INT": pa.int64(),
+    "BIGINT": pa.int64(),
+    "FLOAT": pa.float64(),
+    "DOUBLE": pa.float64(),
+    "BOOL": pa.bool_(),
+    "TEXT": pa.string(),
+    "VARCHAR": pa.string(),
+    "UUID": pa.string(),
+    "BLOB": pa.binary(),
+}
+
+
+def _get_arrow_type(field: P.Field) -> pa.DataType:
+    if isinstance(field, Float32ArrayField):
+        return pa.list_(pa.float32())
+    return _ARROW_TYPES[field.field_type]
+
+
+def get_arrow_schema(model: P.Model) -> pa.Schema:
+    """
+    Returns the Arrow schema for the table of the given peewee model (see database.py).
+    The column names are the column names of the SQLite table, e.g. dataset_id for the dataset foreign key.
+    """
+    return pa.schema(
+        [
+            pa.field(field.column_name, _get_arrow_type(field), nullable=not field.primary_key)
+            for field in model._meta.sorted_fields
+        ]
+    )
+
+
+def _db_value(field: P.Field, value):
+    if isinstance(field, JSONField):
+        # JSONField.db_value wraps the value in SQLite's json() function, which stores the minified JSON text
+        return json.dumps(value, separators=(",", ":")) if value is not None else None
+    if isinstance(field, Float32ArrayField):
+        return np.asarray(value, dtype=np.float32) if value is not None else None
+    if isinstance(field, P.BlobField):
+        return bytes(value) if value is not None else None
+    return field.db_value(value)
+
+
+def get_record_batch(model: P.Model, rows: List[Dict], **values) -> pa.RecordBatch:
+    """
+    Converts the given rows (dicts of field name to value) of the given model to an Arrow record batch.
+    The keyword arguments are set for all rows, e.g. the dataset foreign key.
+    Values are converted with the db_value of the respective field, so the columns contain the same values
+    as the SQLite table written by peewee. The primary key is numbered starting at 1 as in SQLite.
+    """
+    columns = {}
+    for field in model._meta.sorted_fields:
+        if field.primary_key:
+            columns[field.column_name] = list(range(1, len(rows) + 1))
+        elif field.name in values:
+            columns[field.column_name] = [_db_value(field, values[field.name])] * len(rows)
+        else:
+            columns[field.column_name] = [_db_value(field, row.get(field.name)) for row in rows]
+
+    return pa.RecordBatch.from_pydict(columns, schema=get_arrow_schema(model))
+
+
+def write_parquet_table(model: P.Model, rows: List[Dict], parquet_file: FilePath, **values) -> None:
+    """
+    Writes the given rows of the given model to a Parquet file instead of the SQLite database.
+    See get_record_batch for the conversion of the rows.
+    """
+    batch = get_record_batch(model, rows, **values)
+    pq.write_table(pa.Table.from_batches([batch]), parquet_file)
@@ -7,14 +7,18 @@ _HMS_RE = re.compile(r"(?:(\d+)h:)?(?:(\d+)m:)?(?:(\d+)s)")
 def _hms_to_seconds(h, m, s):
     return (int(h or 0) * 3600) + (int(m or 0) * 60) + int(s or 0)
 
+def hms_to_seconds(hms):
+    # e.g. 0h:3m:28s
+    hh, mm, ss = _HMS_RE.search(hms).groups()
+    return float(_hms_to_seconds(hh, mm, ss))
+
 def _get_wallclock_seconds_from_text(text):
     m = re.search(r"^Total wall-clock time used:\s*([0-9]*\.?[0-9]+)\s*sec", text, flags=re.M)
     if m:
         return float(m.group(1))
     m = re.search(r"/\s*Time:\s*([0-9hms:]+)", text)
     if m:
-        hh, mm, ss = _HMS_RE.search(m.group(1)).groups()
-        return float(_hms_to_seconds(hh, mm, ss))
+        return hms_to_seconds(m.group(1))
     m = re.search(r"^Wall-clock time used for tree search:\s*([0-9]*\.?[0-9]+)\s*sec", text, flags=re.M)
     if m:
         return float(m.group(1))
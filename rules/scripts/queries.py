@@ -0,0 +1,70 @@
+"""
+Accessors for the common queries on the (merged) databases. All per-dataset tree queries filter on the
+indexed dataset_uuid column (and plausible/cluster_id, see the indexes in database.py) and are parameterized,
+so the SQL text is identical for all datasets and sqlite3 reuses the prepared statement from its statement cache.
+Use migrate_database in database.py to add the indexes to databases created with an older schema.
+"""
+from database import *
+
+from custom_types import *
+
+TreeModel = Union[IQTreeTree, RaxmlNGTree]
+
+
+def get_datasets(data_type: Optional[str] = None) -> P.ModelSelect:
+    """Returns all datasets, or all datasets of the given data type (DNA, AA, MORPH)."""
+    query = Dataset.select()
+    if data_type is not None:
+        query = query.where(Dataset.data_type == data_type)
+    return query
+
+
+def get_dataset(dataset_uuid: str) -> Dataset:
+    return Dataset.get(Dataset.uuid == dataset_uuid)
+
+
+def get_plausible_trees(dataset_uuid: str, model: TreeModel = IQTreeTree) -> P.ModelSelect:
+    """Returns all trees of the given dataset that are plausible according to the IQ-Tree significance tests."""
+    return model.select().where((model.dataset_uuid == dataset_uuid) & (model.plausible == True))
+
+
+def get_cluster_trees(dataset_uuid: str, cluster_id: int, model: TreeModel = IQTreeTree) -> P.ModelSelect:
+    """Returns all trees of the given dataset with the topology of the given cluster."""
+    return model.select().where((model.dataset_uuid == dataset_uuid) & (model.cluster_id == cluster_id))
+
+
+def get_cluster_sizes(dataset_uuid: str, model: TreeModel = IQTreeTree) -> Dict[int, int]:
+    """Returns the number of trees per topology cluster of the given dataset."""
+    query = (
+        model.select(model.cluster_id, P.fn.COUNT(model.id).alias("num_trees"))
+        .where(model.dataset_uuid == dataset_uuid)
+        .group_by(model.cluster_id)
+    )
+    return {row.cluster_id: row.num_trees for row in query}
+
+
+def get_num_plausible_trees(model: TreeModel = IQTreeTree) -> Dict[str, int]:
+    """Returns the number of plausible trees per dataset uuid, answered from the (dataset_uuid, plausible) index."""
+    query = (
+        model.select(model.dataset_uuid, P.fn.COUNT(model.id).alias("num_trees"))
+        .where(model.plausible == True)
+        .group_by(model.dataset_uuid)
+    )
+    return {row.dataset_uuid.hex: row.num_trees for row in query}
+
+
+def get_parsimony_trees(dataset_uuid: str) -> P.ModelSelect:
+    return ParsimonyTree.select().where(ParsimonyTree.dataset_uuid == dataset_uuid)
+
+
+def get_taxa(dataset_uuid: str) -> List[str]:
+    """Returns the taxon labels of the given dataset ordered by their index, see Taxon in database.py."""
+    query = Taxon.select(Taxon.label).where(Taxon.dataset_uuid == dataset_uuid).order_by(Taxon.index)
+    return [taxon.label for taxon in query]
+
+
+def get_query_plan(query: P.ModelSelect) -> List[str]:
+    """Returns the SQLite query plan of the given query, e.g. to check that it uses an index."""
+    sql, params = query.sql()
+    cursor = query.model._meta.database.execute_sql("EXPLAIN QUERY PLAN " + sql, params)
+    return [row[-1] for row in cursor.fetchall()]
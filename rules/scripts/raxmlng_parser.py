@@ -8,6 +8,7 @@ from utils import (
     get_single_value_from_file,
     get_multiple_values_from_file,
     read_file_contents,
+    read_file_contents_reversed,
 )
 
 from pypythia.raxmlng import RAxMLNG
@@ -15,7 +16,8 @@ from pypythia.raxmlng import RAxMLNG
 
 def get_raxmlng_llh(raxmlng_file: FilePath) -> float:
     STR = "Final LogLikelihood:"
-    return get_single_value_from_file(raxmlng_file, STR)
+    # the final llh is printed once at the very end of the log
+    return get_single_value_from_file(raxmlng_file, STR, from_end=True)
 
 
 def get_raxmlng_starting_llh(raxmlng_file: FilePath) -> float:
@@ -62,7 +64,8 @@ def get_raxmlng_time_from_line(line: str) -> float:
 
 
 def get_raxmlng_elapsed_time(log_file: FilePath) -> float:
-    content = read_file_contents(log_file)
+    # the elapsed time is the last line of the log, scan backwards to avoid reading the whole file
+    content = read_file_contents_reversed(log_file)
 
     for line in content:
         if "Elapsed time:" not in line:
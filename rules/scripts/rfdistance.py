@@ -0,0 +1,265 @@
+import numpy as np
+import regex
+
+from custom_types import *
+from tree_set_metrics import read_trees
+
+# Each tree is reduced to the set of its non-trivial splits (bipartitions). A split is stored as bitset over the
+# taxa of the tree set and normalized such that the bit of the first taxon is never set, i.e. we always store the
+# side that does not contain taxon 0. This makes the encoding independent of the rooting and of the order of the
+# children in the Newick string, so identical topologies yield identical split sets.
+# The RF-Distance of two trees is the size of the symmetric difference of their split sets.
+# For the all-pairs RF-Distances the split sets of all trees are packed into uint64 bitmaps (see get_split_matrix).
+
+# tokens of a Newick string, also used by taxon_encoding:
+# quoted label | comment | single structural character | branch length | unquoted label
+newick_topology_token_re = regex.compile(
+    r"'(?:[^']|'')*'|\[[^\]]*\]|[(),;]|:[^(),;\[]*|[^(),;:\[\]']+"
+)
+
+Split = int
+TaxonIndex = Dict[str, int]
+
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def unquote_label(label: str) -> str:
+    """Returns the given Newick label without surrounding whitespace and quotes, '' is unescaped to '."""
+    label = label.strip()
+    if len(label) > 1 and label[0] == label[-1] == "'":
+        return label[1:-1].replace("''", "'")
+    return label
+
+
+def get_splits_for_tree(newick_str: Newick, taxon_index: TaxonIndex) -> Set[Split]:
+    """
+    Returns the set of non-trivial, normalized splits of the given tree.
+
+    Args:
+        newick_str: Newick string of the tree.
+        taxon_index: Mapping of taxon name to bit position. If empty, it is filled with the taxa of this
+            tree in the order of their appearance. This way the first tree of a tree set defines
+            the taxon order for all following trees.
+
+    Raises:
+        ValueError: If the tree contains a taxon that is not in taxon_index, or not all taxa in taxon_index.
+    """
+    extend_index = len(taxon_index) == 0
+    # bitsets of the leaves below each currently open clade
+    open_clades = []
+    clades = []
+    num_leaves = 0
+    expect_leaf = True
+
+    for m in newick_topology_token_re.finditer(newick_str):
+        token = m.group(0)
+        if token == "(":
+            open_clades.append(0)
+            expect_leaf = True
+        elif token == ",":
+            expect_leaf = True
+        elif token == ")":
+            clade = open_clades.pop()
+            if open_clades:
+                open_clades[-1] |= clade
+                clades.append(clade)
+            expect_leaf = False
+        elif token == ";":
+            break
+        elif token[0] in ":[" or not token.strip():
+            # branch lengths, comments and whitespace carry no topological information
+            continue
+        elif expect_leaf:
+            taxon = unquote_label(token)
+            if taxon not in taxon_index:
+                if not extend_index:
+                    raise ValueError(f"The taxon {taxon} is not part of the first tree of this tree set.")
+                taxon_index[taxon] = len(taxon_index)
+            open_clades[-1] |= 1 << taxon_index[taxon]
+            num_leaves += 1
+            expect_leaf = False
+        # else: label of an inner node (e.g. support values), not relevant for the topology
+
+    num_taxa = len(taxon_index)
+    if num_leaves != num_taxa:
+        raise ValueError(
+            f"The tree contains {num_leaves} taxa, but the tree set contains {num_taxa} taxa: {newick_str[:20]}"
+        )
+
+    all_taxa = (1 << num_taxa) - 1
+    splits = set()
+    for clade in clades:
+        split = clade ^ all_taxa if clade & 1 else clade
+        size = bin(split).count("1")
+        if 1 < size < num_taxa - 1:
+            splits.add(split)
+
+    return splits
+
+
+def get_splits_for_trees(newick_strs: List[Newick]) -> Tuple[List[str], List[FrozenSet[Split]]]:
+    """
+    Returns the taxon names (ordered by their bit position) and the split set of each of the given trees.
+    All trees need to be defined on the same set of taxa.
+    """
+    taxon_index = {}
+    splits = [frozenset(get_splits_for_tree(newick, taxon_index)) for newick in newick_strs]
+    taxa = sorted(taxon_index, key=taxon_index.get)
+    return taxa, splits
+
+
+def _popcount(words: np.ndarray) -> np.ndarray:
+    # number of set bits summed over the last axis of the given uint64 array
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+    bytes_view = words.view(np.uint8).reshape(*words.shape[:-1], -1)
+    return _POPCOUNT_TABLE[bytes_view].sum(axis=-1, dtype=np.int64)
+
+
+def get_split_matrix(splits: List[FrozenSet[Split]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the packed bitset representation of the given split sets.
+
+    Returns:
+        split_words (np.ndarray): uint64 array of shape (num_unique_splits, ceil(num_taxa / 64)).
+            Row k is the bitset of the k-th unique split of the tree set, packed into 64 bit words (little endian).
+        tree_splits (np.ndarray): uint64 array of shape (num_trees, ceil(num_unique_splits / 64)).
+            Row i is the bitset of the unique splits contained in tree i, so set operations on the
+            split sets of two trees reduce to bitwise operations on two rows.
+    """
+    num_trees = len(splits)
+    all_splits = [split for tree_splits in splits for split in tree_splits]
+    splits_per_tree = np.array([len(tree_splits) for tree_splits in splits], dtype=np.int64)
+
+    max_bits = max([split.bit_length() for split in all_splits], default=1)
+    num_bytes = 8 * ((max_bits + 63) // 64)
+
+    split_words = np.frombuffer(
+        b"".join(split.to_bytes(num_bytes, "little") for split in all_splits), dtype="<u8"
+    ).reshape(len(all_splits), num_bytes // 8)
+    split_words, split_ids = np.unique(split_words, axis=0, return_inverse=True)
+    split_ids = split_ids.reshape(-1)
+
+    # bitmap of the splits contained in each tree, padded to full uint64 words
+    num_words = (split_words.shape[0] + 63) // 64
+    membership = np.zeros((num_trees, 64 * num_words), dtype=bool)
+    membership[np.repeat(np.arange(num_trees), splits_per_tree), split_ids] = True
+    tree_splits = np.packbits(membership, axis=1, bitorder="little").view("<u8")
+
+    return split_words, tree_splits
+
+
+def get_rfdistance_matrix(splits: List[FrozenSet[Split]], max_block_words: int = 2 ** 24) -> np.ndarray:
+    """
+    Returns the symmetric matrix of the pairwise absolute RF-Distances for the given split sets.
+
+    The RF-Distance of trees i and j is |S_i| + |S_j| - 2 |S_i & S_j|. The intersections are computed
+    on the packed split bitmaps (see get_split_matrix), comparing a block of trees against all following trees
+    at once. The block size is chosen such that at most max_block_words uint64 words are processed at a time.
+    """
+    num_trees = len(splits)
+    _, tree_splits = get_split_matrix(splits)
+    num_splits = _popcount(tree_splits)
+    block_size = max(1, max_block_words // max(1, num_trees * tree_splits.shape[1]))
+
+    rfdistances = np.zeros((num_trees, num_trees), dtype=np.int64)
+    for start in range(0, num_trees, block_size):
+        end = min(start + block_size, num_trees)
+        shared = _popcount(tree_splits[start:end, None, :] & tree_splits[None, start:, :])
+        block = num_splits[start:end, None] + num_splits[None, start:] - 2 * shared
+        rfdistances[start:end, start:] = block
+        rfdistances[start:, start:end] = block.T
+    return rfdistances
+
+
+def get_topology_clusters(splits: List[FrozenSet[Split]]) -> List[List[TreeIndex]]:
+    """Returns the indices of the trees grouped by identical topology, in the order of the first occurrence of each topology."""
+    clusters = {}
+    for i, tree_splits in enumerate(splits):
+        clusters.setdefault(tree_splits, []).append(i)
+    return list(clusters.values())
+
+
+def _get_average_rfdistances(rfdistances: np.ndarray, num_taxa: int) -> Tuple[float, float]:
+    # returns the relative and absolute RF-Distance averaged over all pairs of trees
+    max_rfdist = 2 * (num_taxa - 3)
+    abs_rfdist = float(rfdistances[np.triu_indices(rfdistances.shape[0], k=1)].mean())
+    rel_rfdist = abs_rfdist / max_rfdist if max_rfdist > 0 else 0.0
+    return rel_rfdist, abs_rfdist
+
+
+def get_rfdistance_results(newick_strs: List[Newick]) -> Tuple[int, float, float]:
+    """Method that computes the number of unique topologies, relative RF-Distance, and absolute RF-Distance for the given set of trees.
+
+    Args:
+        newick_strs: List of Newick strings, all trees need to contain the same set of taxa.
+
+    Returns:
+        num_topos (int): Number of unique topologies of the given set of trees.
+        rel_rfdist (float): Relative RF-Distance of the given set of trees. Computed as average over all pairwise RF-Distances. Value between 0.0 and 1.0.
+        abs_rfdist (float): Absolute RF-Distance of the given set of trees.
+    """
+    if len(newick_strs) <= 1:
+        # same as the dummy result we use if there are not enough trees for RAxML-NG
+        return 1, 0.0, 0.0
+
+    taxa, splits = get_splits_for_trees(newick_strs)
+    rel_rfdist, abs_rfdist = _get_average_rfdistances(get_rfdistance_matrix(splits), len(taxa))
+
+    return len(get_topology_clusters(splits)), rel_rfdist, abs_rfdist
+
+
+def get_rfdistance_results_for_file(trees_file: FilePath) -> Tuple[int, float, float]:
+    """Same as get_rfdistance_results, but for all trees in the given .trees file (one Newick string per line)."""
+    return get_rfdistance_results(read_trees(trees_file))
+
+
+def write_rfdistance_files(trees_file: FilePath, rfdist_file: FilePath, log_file: FilePath) -> None:
+    """
+    Computes the RF-Distances for all trees in trees_file and writes the results in the same format as
+    `raxml-ng --rfdist` does: the pairwise distances to rfdist_file and the summary to log_file.
+    The log file also contains the clusters of identical topologies as list of tree indices, one cluster per line.
+
+    The relative distances are rounded to 6 decimals like current RAxML-NG versions write them
+    (e.g. 0.234694 for 46/196, see .tests/data/logs/raxml.many.rfdistances). Files of older RAxML-NG versions
+    truncate them and write 0.0 instead of 0.000000 (e.g. 0.666666 for 4/6, see .tests/data/logs/raxml.rfdistances),
+    the pairwise distances of those files differ from ours in the last digit.
+    """
+    newick_strs = read_trees(trees_file)
+
+    if len(newick_strs) <= 1:
+        # RAxML-NG requires more than one tree to compute RF-Distances, keep the dummy output we used for this case
+        num_topos, rel_rfdist, abs_rfdist = get_rfdistance_results(newick_strs)
+        pairs = ["0 1 0.0 0.0"]
+        clusters = []
+    else:
+        taxa, splits = get_splits_for_trees(newick_strs)
+        rfdistances = get_rfdistance_matrix(splits)
+        max_rfdist = 2 * (len(taxa) - 3)
+        rel_rfdist, abs_rfdist = _get_average_rfdistances(rfdistances, len(taxa))
+        clusters = get_topology_clusters(splits)
+        num_topos = len(clusters)
+
+        pairs = []
+        for i, j in zip(*np.triu_indices(len(splits), k=1)):
+            rel = rfdistances[i, j] / max_rfdist if max_rfdist > 0 else 0.0
+            pairs.append(f"{i}\t{j}\t{rfdistances[i, j]}\t{rel:.6f}")
+
+    with open(rfdist_file, "w") as f:
+        f.write("\n".join(pairs) + "\n")
+
+    with open(log_file, "w") as f:
+        f.write(f"Number of unique topologies in this tree set: {num_topos}\n")
+        f.write(f"Average absolute RF distance in this tree set: {abs_rfdist}\n")
+        f.write(f"Average relative RF distance in this tree set: {rel_rfdist}\n")
+        if num_topos > 1:
+            for cluster in clusters:
+                f.write(str(cluster) + "\n")
+
+
+if __name__ == "__main__":
+    write_rfdistance_files(
+        trees_file=snakemake.input[0],
+        rfdist_file=snakemake.output.rfDist,
+        log_file=snakemake.output.rfDist_log,
+    )
@@ -1,10 +1,10 @@
 import json
 import numpy as np
-import pickle
 import uuid
+import warnings
 
 from database import *
-from iqtree_statstest_parser import get_iqtree_results, get_iqtree_results_for_eval_tree_str
+from iqtree_statstest_parser import get_iqtree_results
 from raxmlng_parser import (
     get_all_raxmlng_llhs,
     get_raxmlng_llh,
@@ -20,35 +20,35 @@ from raxmlng_parser import (
 from iqtree_parser import (
     get_all_iqtree_llhs,
     get_iqtree_runtimes,
-    get_iqtree_llh,
-    get_iqtree_starting_llh,
-    get_model_parameter_estimates,
-    get_iqtree_num_iterations
+    parse_iqtree_log_record,
 )
 
-from pypythia.raxmlng_parser import get_raxmlng_rfdist_results
+from column_entropies import get_column_entropy_summary
+from log_cache import ParsedLogCache
+from newick_compression import get_newick_dictionary, compress_newick
+from taxon_encoding import get_taxa, encode_taxa
+from parquet_writer import write_parquet_table
+from rfdistance import get_rfdistance_results_for_file
 
-from tree_metrics import (
-    get_total_branch_length_for_tree,
-    get_min_branch_length_for_tree,
-    get_max_branch_length_for_tree,
-    get_std_branch_lengths_for_tree,
-    get_avg_branch_lengths_for_tree,
-)
+from tree_metrics import branch_length_summary
+from utils import get_dataset_hash
+from tree_set_metrics import branch_length_matrix
 
-from pypythia.msa import MSA
-
-db.init(snakemake.output.database)
-db.connect()
-db.create_tables(
-    [
-        Dataset,
-        RaxmlNGTree,
-        ParsimonyTree,
-        IQTreeTree
-    ]
-)
+
+# the data is either stored in a SQLite database or directly written to one Parquet file per table
+backend = snakemake.params.backend
+if backend not in ["sqlite", "parquet"]:
+    raise ValueError(f"Unknown storage backend {backend}, use 'sqlite' or 'parquet'.")
+
+if backend == "sqlite":
+    # write-time PRAGMAs (journal mode, synchronous, ...) are set in the config file
+    db.init(snakemake.output.database, pragmas=snakemake.params.db_pragmas)
+    db.connect()
+    db.create_tables(MODELS)
 dataset_name = snakemake.wildcards.msa
+# parsed log values are cached next to the log files, rebuilding the database does not re-parse unchanged logs
+# logs of the individual trees are parsed in parallel using params.threads worker processes
+log_cache = ParsedLogCache(snakemake.params.parsed_log_cache, num_workers=snakemake.params.threads)
 raxmlng_command = snakemake.params.raxmlng_command
 iqtree_command = snakemake.params.iqtree_command
 
@@ -59,7 +59,7 @@ pars_search_logs = snakemake.input.pars_search_logs
 rand_search_trees = snakemake.input.rand_search_trees
 rand_search_logs = snakemake.input.rand_search_logs
 search_logs_collected = snakemake.input.search_logs_collected
-search_rfdistance = snakemake.input.search_rfdistance
+search_trees_collected = snakemake.input.search_trees_collected
 
 # eval
 pars_eval_trees = snakemake.input.pars_eval_trees
@@ -67,14 +67,13 @@ pars_eval_logs = snakemake.input.pars_eval_logs
 rand_eval_trees = snakemake.input.rand_eval_trees
 rand_eval_logs = snakemake.input.rand_eval_logs
 eval_logs_collected = snakemake.input.eval_logs_collected
-eval_rfdistance = snakemake.input.eval_rfdistance
+eval_trees_collected = snakemake.input.eval_trees_collected
 
 # plausible
-plausible_rfdistance = snakemake.input.plausible_rfdistance
 plausible_trees_collected = snakemake.input.plausible_trees_collected
-iqtree_results = get_iqtree_results(snakemake.input.iqtree_results)
-with open(snakemake.input.clusters, "rb") as f:
-    clusters = pickle.load(f)
+iqtree_results = log_cache.parse(get_iqtree_results, snakemake.input.iqtree_results)
+# cluster_ids[i] is the cluster of the i-th eval tree (pars_* then rand_*) and the index of its IQ-Tree test results
+cluster_ids = np.load(snakemake.input.clusters, allow_pickle=False)
 
 # msa features
 with open(snakemake.input.msa_features) as f:
@@ -83,37 +82,77 @@ with open(snakemake.input.msa_features) as f:
 # parsimony trees
 parsimony_trees = snakemake.input.parsimony_trees
 parsimony_logs = snakemake.input.parsimony_logs
-parsimony_rfdistance = snakemake.input.parsimony_rfdistance
 
-llhs_search = get_all_iqtree_llhs(search_logs_collected)
-llhs_eval = get_all_iqtree_llhs(eval_logs_collected)
+llhs_search = log_cache.parse(get_all_iqtree_llhs, search_logs_collected)
+llhs_eval = log_cache.parse(get_all_iqtree_llhs, eval_logs_collected)
+
+parsimony_scores = log_cache.parse(get_all_parsimony_scores, parsimony_logs)
+parsimony_runtimes = log_cache.parse(get_raxmlng_runtimes, parsimony_logs)
 
-parsimony_scores = get_all_parsimony_scores(parsimony_logs)
-parsimony_runtimes = get_raxmlng_runtimes(parsimony_logs)
+# branch length statistics for all search and eval trees, one row per tree in the order pars_* then rand_*
+brlens_search = branch_length_matrix(search_trees_collected)
+brlens_eval = branch_length_matrix(eval_trees_collected)
 
 num_searches = len(pars_search_trees) + len(rand_search_trees)
-data_type = MSA(snakemake.params.msa).data_type
+data_type = snakemake.params.data_type
 
 # for the starting tree features, we simply take the first parsimony tree inference
 single_tree = pars_search_trees[0]
 single_tree_log = pars_search_logs[0]
 #single_tree_starting = pars_starting_trees[0]
 
-slow_spr, fast_spr = get_iqtree_num_iterations(single_tree_log)
-starting_llh = get_iqtree_starting_llh(single_tree_log)
-final_llh = get_iqtree_llh(single_tree_log)
+# all values of the single inference log are parsed in one pass
+single_tree_record = log_cache.parse(parse_iqtree_log_record, single_tree_log)
+if single_tree_record.llh is None:
+    raise ValueError(f"The given input file {single_tree_log} does not contain the final llh.")
+
+slow_spr, fast_spr = single_tree_record.num_iterations or 0, 0
+starting_llh = single_tree_record.starting_llh
+if starting_llh is None:
+    # If the run was restarted, the starting LLH might not be in the log file
+    warnings.warn("The given file does not contain the starting llh " + single_tree_log)
+    starting_llh = -np.inf
+final_llh = single_tree_record.llh
 #newick_starting = open(single_tree_starting).readline()
 newick_final = open(single_tree).readline()
-rate_het, base_freq, subst_rates = get_model_parameter_estimates(single_tree_log)
-
-num_topos_search, avg_rfdist_search, _ = get_raxmlng_rfdist_results(search_rfdistance)
-num_topos_eval, avg_rfdist_eval, _ = get_raxmlng_rfdist_results(eval_rfdistance)
-num_topos_plausible, avg_rfdist_plausible, _ = get_raxmlng_rfdist_results(plausible_rfdistance)
-num_topos_parsimony, avg_rfdist_parsimony, _ = get_raxmlng_rfdist_results(parsimony_rfdistance)
+# the taxon labels are either stored in the trees or once in the taxon table with the trees referring to their index
+encode_trees = snakemake.params.newick_taxa == "indices"
+taxa = get_taxa(newick_final)
+taxon_index = dict(zip(taxa, range(len(taxa))))
+# trees are either stored as text or zlib compressed with a dictionary of the taxon labels shared by all trees of the MSA
+compress_trees = snakemake.params.newick == "zlib"
+newick_dictionary = None
+if compress_trees:
+    newick_dictionary = get_newick_dictionary([encode_taxa(newick_final, taxon_index) if encode_trees else newick_final])
+
+
+def get_newick_columns(column, newick):
+    if encode_trees:
+        newick = encode_taxa(newick, taxon_index)
+    if compress_trees:
+        return {column: None, column + "_zlib": compress_newick(newick, newick_dictionary)}
+    return {column: newick}
+
+brlens_final = branch_length_summary(newick_final)
+rate_het = single_tree_record.rate_het
+base_freq = single_tree_record.base_freq
+subst_rates = single_tree_record.subst_rates
+
+# RF-Distances are computed in-process directly on the collected tree files, no raxml-ng --rfdist run required
+num_topos_search, avg_rfdist_search, _ = get_rfdistance_results_for_file(search_trees_collected)
+num_topos_eval, avg_rfdist_eval, _ = get_rfdistance_results_for_file(eval_trees_collected)
+num_topos_plausible, avg_rfdist_plausible, _ = get_rfdistance_results_for_file(plausible_trees_collected)
+num_topos_parsimony, avg_rfdist_parsimony, _ = get_rfdistance_results_for_file(parsimony_trees)
+
+# all rows of the dataset are built in memory first and written in a single transaction at the end
+# the dataset is identified by the hash of the MSA and the settings of the run, rerunning an MSA yields the same uuid
+content_hash = get_dataset_hash(snakemake.params.msa, snakemake.params.dataset_settings)
+dataset_uuid = content_hash[:32]
 
 # fmt: off
-dataset_dbobj = Dataset.create(
-    uuid        = uuid.uuid4().hex,
+dataset_row = dict(
+    uuid        = dataset_uuid,
+    content_hash= content_hash,
     verbose_name= dataset_name,
     data_type = data_type,
 
@@ -132,7 +171,7 @@ dataset_dbobj = Dataset.create(
 
     avg_rfdist_plausible    = avg_rfdist_plausible,
     num_topos_plausible     = num_topos_plausible,
-    # we will update this information after inserting the trees to the database
+    # we will set this information after building the rows for the trees
     mean_llh_plausible  = None,
     std_llh_plausible   = None,
     num_trees_plausible = None,
@@ -148,13 +187,15 @@ dataset_dbobj = Dataset.create(
     rate_heterogeneity_final        = rate_het,
     eq_frequencies_final            = base_freq,
     substitution_rates_final        = subst_rates,
-    average_branch_length_final     = get_avg_branch_lengths_for_tree(newick_final),
-    std_branch_length_final         = get_std_branch_lengths_for_tree(newick_final),
-    total_branch_length_final       = get_total_branch_length_for_tree(newick_final),
-    minimum_branch_length_final     = get_min_branch_length_for_tree(newick_final),
-    maximum_branch_length_final     = get_max_branch_length_for_tree(newick_final),
+    average_branch_length_final     = brlens_final["avg"],
+    std_branch_length_final         = brlens_final["std"],
+    total_branch_length_final       = brlens_final["total"],
+    minimum_branch_length_final     = brlens_final["min"],
+    maximum_branch_length_final     = brlens_final["max"],
     #newick_starting                 = newick_starting,
-    newick_final                    = newick_final,
+    **get_newick_columns("newick_final", newick_final),
+    newick_dictionary               = newick_dictionary,
+    taxa_encoded                    = encode_trees,
 
     # MSA Features
     num_taxa                = msa_features["taxa"],
@@ -166,6 +207,7 @@ dataset_dbobj = Dataset.create(
     column_entropies        = msa_features["column_entropies"],
     bollback                = msa_features["bollback"],
     treelikeness            = msa_features["treelikeness"],
+    char_frequencies        = msa_features.get("char_frequencies"),
 
     # Parsimony Trees Features
     avg_rfdist_parsimony    = avg_rfdist_parsimony,
@@ -175,30 +217,44 @@ dataset_dbobj = Dataset.create(
 )
 # fmt: on
 
-from parse_iqtree_logs import parse_iqtree_log
-from iqtree_statstest_parser import get_iqtree_results, get_iqtree_results_for_eval_tree_str
+# the column entropies are either stored as JSON list or as compact float32 blob, the summary is always stored
+if snakemake.params.column_entropies == "float32":
+    dataset_row["column_entropies_float32"] = dataset_row.pop("column_entropies")
+dataset_row.update(get_column_entropy_summary(msa_features["column_entropies"]))
 
-def save_iqtree_tree(search_trees, search_logs, eval_trees, eval_logs, starting_type):
+
+def get_iqtree_tree_rows(search_trees, search_logs, eval_trees, eval_logs, search_brlens, eval_brlens, cluster_ids, starting_type):
+    rows = []
     plausible_llhs = []
+    search_records = log_cache.parse_many(parse_iqtree_log_record, search_logs)
 
-    for search_tree, search_log, eval_tree, eval_log in zip(search_trees, search_logs, eval_trees, eval_logs):
-        newick_eval = open(eval_tree).readline()
-        statstest_results, cluster_id = get_iqtree_results_for_eval_tree_str(iqtree_results, newick_eval, clusters)
+    for search_tree, search_record, eval_tree, search_brlen, eval_brlen, cluster_id in zip(
+            search_trees, search_records, eval_trees, search_brlens, eval_brlens, cluster_ids
+    ):
+        statstest_results = iqtree_results[cluster_id]
         tests = statstest_results["tests"]
-        log_data = parse_iqtree_log(search_log)
 
-        IQTreeTree.create(
-            dataset=dataset_dbobj,
-            dataset_uuid=dataset_dbobj.uuid,
+        rows.append(dict(
+            dataset_uuid=dataset_uuid,
             uuid=uuid.uuid4().hex,
 
             starting_type=starting_type,
-            newick_search=open(search_tree).readline(),
-            llh_search=log_data["log_likelihood"],
-            compute_time_search=log_data["runtime"],
+            **get_newick_columns("newick_search", open(search_tree).readline()),
+            llh_search=search_record.llh,
+            compute_time_search=search_record.runtime,
+            total_branch_length_search=search_brlen[0],
+            minimum_branch_length_search=search_brlen[1],
+            maximum_branch_length_search=search_brlen[2],
+            average_branch_length_search=search_brlen[3],
+            std_branch_length_search=search_brlen[4],
+            total_branch_length_eval=eval_brlen[0],
+            minimum_branch_length_eval=eval_brlen[1],
+            maximum_branch_length_eval=eval_brlen[2],
+            average_branch_length_eval=eval_brlen[3],
+            std_branch_length_eval=eval_brlen[4],
 
             plausible=statstest_results["plausible"],
-            cluster_id=cluster_id,
+            cluster_id=int(cluster_id),
 
             bpRell=tests["bp-RELL"]["score"],
             bpRell_significant=tests["bp-RELL"]["significant"],
@@ -214,40 +270,46 @@ def save_iqtree_tree(search_trees, search_logs, eval_trees, eval_logs, starting_
             cELW_significant=tests["c-ELW"]["significant"],
             pAU=tests["p-AU"]["score"],
             pAU_significant=tests["p-AU"]["significant"],
-        )
+        ))
 
         if statstest_results["plausible"]:
-            plausible_llhs.append(log_data["log_likelihood"])
+            plausible_llhs.append(search_record.llh)
 
-    return plausible_llhs
+    return rows, plausible_llhs
 
-def save_raxmlng_tree(search_trees, search_logs, eval_trees, eval_logs, starting_type):
+def get_raxmlng_tree_rows(search_trees, search_logs, eval_trees, eval_logs, cluster_ids, starting_type):
+    rows = []
     plausible_llhs = []
-
-    for (search_tree, search_log, eval_tree, eval_log) in zip(search_trees, search_logs, eval_trees, eval_logs):
+    llhs_search = log_cache.parse_many(get_raxmlng_llh, search_logs)
+    times_search = log_cache.parse_many(get_raxmlng_elapsed_time, search_logs)
+    llhs_eval = log_cache.parse_many(get_raxmlng_llh, eval_logs)
+    times_eval = log_cache.parse_many(get_raxmlng_elapsed_time, eval_logs)
+
+    for (search_tree, llh_search, time_search, eval_tree, llh_eval, time_eval, cluster_id) in zip(
+            search_trees, llhs_search, times_search, eval_trees, llhs_eval, times_eval, cluster_ids
+    ):
         newick_eval = open(eval_tree).readline()
-        statstest_results, cluster_id = get_iqtree_results_for_eval_tree_str(iqtree_results, newick_eval, clusters)
+        statstest_results = iqtree_results[cluster_id]
         tests = statstest_results["tests"]
 
-        RaxmlNGTree.create(
-            dataset=dataset_dbobj,
-            dataset_uuid=dataset_dbobj.uuid,
+        rows.append(dict(
+            dataset_uuid=dataset_uuid,
             uuid=uuid.uuid4().hex,
 
             # Search trees
             starting_type=starting_type,
-            newick_search=open(search_tree).readline(),
-            llh_search=get_raxmlng_llh(search_log),
-            compute_time_search=get_raxmlng_elapsed_time(search_log),
+            **get_newick_columns("newick_search", open(search_tree).readline()),
+            llh_search=llh_search,
+            compute_time_search=time_search,
 
             # Eval trees
-            newick_eval=newick_eval,
-            llh_eval=get_raxmlng_llh(eval_log),
-            compute_time_eval=get_raxmlng_elapsed_time(eval_log),
+            **get_newick_columns("newick_eval", newick_eval),
+            llh_eval=llh_eval,
+            compute_time_eval=time_eval,
 
             # Plausible trees
             plausible=statstest_results["plausible"],
-            cluster_id=cluster_id,
+            cluster_id=int(cluster_id),
 
             bpRell=tests["bp-RELL"]["score"],
             bpRell_significant=tests["bp-RELL"]["significant"],
@@ -263,39 +325,72 @@ def save_raxmlng_tree(search_trees, search_logs, eval_trees, eval_logs, starting
             cELW_significant=tests["c-ELW"]["significant"],
             pAU=tests["p-AU"]["score"],
             pAU_significant=tests["p-AU"]["significant"],
-        )
+        ))
 
         if statstest_results["plausible"]:
-            plausible_llhs.append(get_raxmlng_llh(eval_log))
+            plausible_llhs.append(llh_eval)
 
-    return plausible_llhs
+    return rows, plausible_llhs
 
-# store the parsimony and random iqtree trees in the database
-plausible_llhs_pars = save_iqtree_tree(pars_search_trees, pars_search_logs, pars_eval_trees, pars_eval_logs, "parsimony")
-plausible_llhs_rand = save_iqtree_tree(rand_search_trees, rand_search_logs, rand_eval_trees, rand_eval_logs, "random")
+# the parsimony and random iqtree trees
+num_pars = len(pars_search_trees)
+assert len(cluster_ids) == num_searches
+iqtree_rows_pars, plausible_llhs_pars = get_iqtree_tree_rows(
+    pars_search_trees, pars_search_logs, pars_eval_trees, pars_eval_logs,
+    brlens_search[:num_pars], brlens_eval[:num_pars], cluster_ids[:num_pars], "parsimony"
+)
+iqtree_rows_rand, plausible_llhs_rand = get_iqtree_tree_rows(
+    rand_search_trees, rand_search_logs, rand_eval_trees, rand_eval_logs,
+    brlens_search[num_pars:], brlens_eval[num_pars:], cluster_ids[num_pars:], "random"
+)
 
 plausible_llhs = plausible_llhs_pars + plausible_llhs_rand
-dataset_dbobj.update(
+dataset_row.update(
     {
         "mean_llh_plausible": np.mean(plausible_llhs),
         "std_llh_plausible": np.std(plausible_llhs),
         "num_trees_plausible": len(plausible_llhs),
         "proportion_plausible": len(plausible_llhs) / num_searches,
     }
-).execute()
+)
 
-# store the parsimonator parsimony trees in the database
+# the parsimonator parsimony trees
 parsimony_trees = open(parsimony_trees).readlines()
 parsimony_trees = [tree.strip() for tree in parsimony_trees if tree]
 
 assert len(parsimony_trees) == len(parsimony_scores)
 
-for (score, runtime, tree) in zip(parsimony_scores, parsimony_runtimes, parsimony_trees):
-    ParsimonyTree.create(
+parsimony_rows = [
+    dict(
         uuid            = uuid.uuid4(),
-        dataset         = dataset_dbobj,
-        dataset_uuid    = dataset_dbobj.uuid,
-        newick_tree     = tree,
+        dataset_uuid    = dataset_uuid,
+        **get_newick_columns("newick_tree", tree),
         parsimony_score = score,
         compute_time    = runtime
     )
+    for (score, runtime, tree) in zip(parsimony_scores, parsimony_runtimes, parsimony_trees)
+]
+
+taxon_rows = [
+    dict(dataset_uuid=dataset_uuid, index=index, label=taxon)
+    for taxon, index in taxon_index.items()
+] if encode_trees else []
+
+log_cache.close()
+
+if backend == "parquet":
+    # the schema of the tables is given by the models in database.py, the dataset is the only row with id 1
+    write_parquet_table(Dataset, [dataset_row], snakemake.output.dataset)
+    write_parquet_table(IQTreeTree, iqtree_rows_pars + iqtree_rows_rand, snakemake.output.iqtree_trees, dataset=1)
+    write_parquet_table(ParsimonyTree, parsimony_rows, snakemake.output.parsimony_trees, dataset=1)
+    write_parquet_table(Taxon, taxon_rows, snakemake.output.taxa, dataset=1)
+else:
+    # store everything in the (new) database of this MSA in one transaction, datasets with the same content hash
+    # are only deduplicated when merging the databases of several runs, see merge_databases.py
+    with db.atomic():
+        dataset_dbobj = Dataset.create(**dataset_row)
+        bulk_insert(IQTreeTree, iqtree_rows_pars + iqtree_rows_rand, dataset=dataset_dbobj)
+        bulk_insert(ParsimonyTree, parsimony_rows, dataset=dataset_dbobj)
+        bulk_insert(Taxon, taxon_rows, dataset=dataset_dbobj)
+
+    db.close()
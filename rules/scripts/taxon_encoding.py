@@ -0,0 +1,72 @@
+import regex
+
+from custom_types import *
+from rfdistance import TaxonIndex, newick_topology_token_re, unquote_label
+
+# characters that require a taxon label to be quoted in Newick format
+_label_requires_quotes_re = regex.compile(r"[\s()\[\]':;,]")
+
+
+def _quote_label(label: str) -> str:
+    if _label_requires_quotes_re.search(label):
+        return "'" + label.replace("'", "''") + "'"
+    return label
+
+
+def _replace_taxa(newick_str: Newick, replace: Callable[[str], str]) -> Newick:
+    # the leaves are identified as in rfdistance.get_splits_for_tree, all other tokens are kept as they are
+    tokens = []
+    expect_leaf = True
+
+    for m in newick_topology_token_re.finditer(newick_str):
+        token = m.group(0)
+        if token in ("(", ","):
+            expect_leaf = True
+        elif token == ")":
+            expect_leaf = False
+        elif token == ";":
+            tokens.append(token)
+            break
+        elif token[0] not in ":[" and token.strip() and expect_leaf:
+            token = replace(unquote_label(token))
+            expect_leaf = False
+        tokens.append(token)
+
+    return "".join(tokens)
+
+
+def get_taxa(newick_str: Newick) -> List[str]:
+    """Returns the taxon labels of the given tree in the order of their appearance."""
+    taxa = []
+
+    def _collect(taxon):
+        taxa.append(taxon)
+        return taxon
+
+    _replace_taxa(newick_str, _collect)
+    return taxa
+
+
+def encode_taxa(newick_str: Newick, taxon_index: TaxonIndex) -> Newick:
+    """
+    Replaces the taxon labels of the given tree with their index in taxon_index, e.g. ((0:0.1,1:0.2),2);
+    Branch lengths, inner node labels and comments are kept.
+
+    Raises:
+        ValueError: If the tree contains a taxon that is not in taxon_index.
+    """
+
+    def _encode(taxon):
+        if taxon not in taxon_index:
+            raise ValueError(f"The taxon {taxon} is not part of the taxon index.")
+        return str(taxon_index[taxon])
+
+    return _replace_taxa(newick_str, _encode)
+
+
+def decode_taxa(newick_str: Newick, taxa: List[str]) -> Newick:
+    """
+    Replaces the taxon indices of a tree encoded with encode_taxa with the taxon labels.
+    Labels with whitespace or Newick special characters are quoted.
+    """
+    return _replace_taxa(newick_str, lambda index: _quote_label(taxa[int(index)]))
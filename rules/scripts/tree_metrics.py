@@ -1,39 +1,79 @@
+import regex
 from Bio import Phylo
 import numpy as np
 
 from custom_types import *
 
+# Single-pass Newick scanner: quoted labels and [comments] are matched (and skipped) as a whole,
+# so a ':' inside a taxon name or a comment is never mistaken for a branch length
+_newick_token_re = regex.compile(
+    r"'(?:[^']|'')*'"  # quoted label, '' is an escaped quote
+    r"|\[[^\]]*\]"  # comment
+    r"|:\s*([-+]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?)"  # branch length
+)
+
+BRANCH_LENGTH_STATISTICS = ["total", "min", "max", "avg", "std"]
+
 
 def get_tree_object(newick_str: Newick):
     trees = list(Phylo.NewickIO.Parser.from_string(newick_str).parse())
     return trees[0]
 
 
+def get_branch_lengths_array(newick_str: Newick) -> np.ndarray:
+    """
+    Returns all branch lengths of the given Newick string as float64 array in a single linear scan,
+    without building a tree object.
+    As with Bio.Phylo's find_clades(branch_length=True), branches of length 0.0 are not included.
+    """
+    brlens = np.array(
+        [m.group(1) for m in _newick_token_re.finditer(newick_str) if m.group(1)],
+        dtype=np.float64,
+    )
+    return brlens[brlens != 0]
+
+
+def branch_length_summary(newick_str: Newick) -> Dict[str, float]:
+    """
+    Returns the total, minimum, maximum, average and standard deviation of the branch lengths
+    of the given Newick string, all computed from one scan of the string.
+    The keys of the returned dict are the entries of BRANCH_LENGTH_STATISTICS (in this order).
+    """
+    all_brlens = get_branch_lengths_array(newick_str)
+
+    if all_brlens.size == 0:
+        raise ValueError(
+            f"The given newick string does not contain branch lengths: {newick_str[:20]}"
+        )
+
+    return {
+        "total": float(all_brlens.sum()),
+        "min": float(all_brlens.min()),
+        "max": float(all_brlens.max()),
+        "avg": float(all_brlens.mean()),
+        "std": float(all_brlens.std()),
+    }
+
+
 def get_all_branch_lengths_for_tree(newick_str: Newick) -> List[float]:
-    tree = get_tree_object(newick_str)
-    return [node.branch_length for node in tree.find_clades(branch_length=True)]
+    return get_branch_lengths_array(newick_str).tolist()
 
 
 def get_total_branch_length_for_tree(newick_str: Newick) -> float:
-    all_brlens = get_all_branch_lengths_for_tree(newick_str)
-    return sum(all_brlens)
+    return branch_length_summary(newick_str)["total"]
 
 
 def get_min_branch_length_for_tree(newick_str: Newick) -> float:
-    all_brlens = get_all_branch_lengths_for_tree(newick_str)
-    return min(all_brlens)
+    return branch_length_summary(newick_str)["min"]
 
 
 def get_max_branch_length_for_tree(newick_str: Newick) -> float:
-    all_brlens = get_all_branch_lengths_for_tree(newick_str)
-    return max(all_brlens)
+    return branch_length_summary(newick_str)["max"]
 
 
 def get_avg_branch_lengths_for_tree(newick_str: Newick) -> float:
-    all_brlens = get_all_branch_lengths_for_tree(newick_str)
-    return np.mean(all_brlens)
+    return branch_length_summary(newick_str)["avg"]
 
 
 def get_std_branch_lengths_for_tree(newick_str: Newick) -> float:
-    all_brlens = get_all_branch_lengths_for_tree(newick_str)
-    return np.std(all_brlens)
\ No newline at end of file
+    return branch_length_summary(newick_str)["std"]
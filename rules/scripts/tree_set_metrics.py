@@ -0,0 +1,57 @@
+import numpy as np
+
+from custom_types import *
+from tree_metrics import BRANCH_LENGTH_STATISTICS, get_branch_lengths_array
+
+
+def read_trees(trees_file: FilePath) -> List[Newick]:
+    """Returns all Newick strings in the given .trees file (one tree per line, empty lines are skipped)."""
+    with open(trees_file) as f:
+        return [l.strip() for l in f if l.strip()]
+
+
+def branch_length_matrix_for_trees(newick_strs: List[Newick]) -> np.ndarray:
+    """
+    Returns a float64 array of shape (num_trees, len(BRANCH_LENGTH_STATISTICS)).
+    Row i contains the total, min, max, average and standard deviation of the branch lengths of tree i,
+    the column order is the order of BRANCH_LENGTH_STATISTICS.
+
+    The branch lengths of all trees are concatenated into one array and the statistics for all
+    trees are computed at once using segmented reductions, so there is no per-tree Python loop
+    besides scanning the Newick strings.
+    """
+    num_trees = len(newick_strs)
+    stats = np.empty((num_trees, len(BRANCH_LENGTH_STATISTICS)), dtype=np.float64)
+    if num_trees == 0:
+        return stats
+
+    per_tree = [get_branch_lengths_array(newick) for newick in newick_strs]
+    counts = np.array([brlens.size for brlens in per_tree])
+
+    if np.any(counts == 0):
+        empty = np.flatnonzero(counts == 0).tolist()
+        raise ValueError(f"The trees with the following indices do not contain branch lengths: {empty}")
+
+    all_brlens = np.concatenate(per_tree)
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    totals = np.add.reduceat(all_brlens, offsets)
+    means = totals / counts
+    deviations = (all_brlens - np.repeat(means, counts)) ** 2
+
+    stats[:, 0] = totals
+    stats[:, 1] = np.minimum.reduceat(all_brlens, offsets)
+    stats[:, 2] = np.maximum.reduceat(all_brlens, offsets)
+    stats[:, 3] = means
+    stats[:, 4] = np.sqrt(np.add.reduceat(deviations, offsets) / counts)
+
+    return stats
+
+
+def branch_length_matrix(trees_file: FilePath) -> np.ndarray:
+    """
+    Returns the branch length statistics for all trees in the given .trees file
+    (e.g. AllSearchTrees.trees or AllEvalTrees.trees), one row per tree.
+    See branch_length_matrix_for_trees for the layout of the returned array.
+    """
+    return branch_length_matrix_for_trees(read_trees(trees_file))
@@ -1,3 +1,7 @@
+import hashlib
+import json
+import os
+
 from custom_types import *
 
 
@@ -8,6 +12,61 @@ def read_file_contents(file_path: FilePath) -> List[str]:
     return [l.strip() for l in content]
 
 
+def read_file_contents_reversed(file_path: FilePath, block_size: int = 2**16) -> Iterator[str]:
+    """
+    Yields the stripped lines of the given file from the last to the first line.
+    The file is read in blocks of block_size bytes starting at its end, so stopping the iteration early
+    only reads the tail of the file. Use this for values at the end of large log files.
+    """
+    with open(file_path, "rb") as f:
+        position = f.seek(0, os.SEEK_END)
+        remainder = b""
+        at_end = True
+
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            lines = (f.read(read_size) + remainder).split(b"\n")
+            # the first line might be incomplete, it is completed with the next block
+            remainder = lines.pop(0)
+            if at_end and lines and not lines[-1]:
+                # trailing newline at the end of the file
+                lines.pop()
+            at_end = False
+
+            for line in reversed(lines):
+                yield line.decode().strip()
+
+        if remainder or not at_end:
+            yield remainder.decode().strip()
+
+
+def _update_hash(sha, file_path: FilePath, block_size: int) -> None:
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            sha.update(block)
+
+
+def get_file_hash(file_path: FilePath, block_size: int = 2**20) -> str:
+    """Returns the SHA-256 hex digest of the content of the given file."""
+    sha = hashlib.sha256()
+    _update_hash(sha, file_path, block_size)
+    return sha.hexdigest()
+
+
+def get_dataset_hash(msa_file: FilePath, settings: Dict, block_size: int = 2**20) -> str:
+    """
+    Returns the SHA-256 hex digest of the content of the given MSA file and the given settings (model, seeds, ...).
+    The hash identifies a dataset across runs: the same MSA with the same settings always yields the same hash,
+    regardless of the file path or the time of the run. The settings need to be JSON serializable.
+    """
+    sha = hashlib.sha256()
+    _update_hash(sha, msa_file, block_size)
+    sha.update(json.dumps(settings, sort_keys=True).encode())
+    return sha.hexdigest()
+
+
 def get_value_from_line(line: str, search_string: str) -> float:
     line = line.strip()
     if search_string in line:
@@ -19,9 +78,19 @@ def get_value_from_line(line: str, search_string: str) -> float:
     )
 
 
-def get_single_value_from_file(input_file: FilePath, search_string: str) -> float:
-    with open(input_file) as f:
-        lines = f.readlines()
+def get_single_value_from_file(
+    input_file: FilePath, search_string: str, from_end: bool = False
+) -> float:
+    """
+    Returns the value of the first line containing the search string.
+    If from_end is set, the file is scanned backwards from its end and the value of the last line
+    containing the search string is returned.
+    """
+    if from_end:
+        lines = read_file_contents_reversed(input_file)
+    else:
+        with open(input_file) as f:
+            lines = f.readlines()
 
     for l in lines:
         if search_string in l:
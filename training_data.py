@@ -0,0 +1,70 @@
+"""
+This file contains a loader for the training_data.parquet files that only reads the columns of a feature group in features.py
+"""
+from typing import List, Optional, Tuple, Union
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from features import (
+    LABEL,
+    FINAL_FEATURES,
+    ALL_FEATURES,
+    ADDITIONAL_FEATURES,
+    COLUMN_ENTROPY_SUMMARY_FEATURES,
+    LABEL_GENERATION_FEATURES,
+)
+
+FEATURE_GROUPS = {
+    "FINAL_FEATURES": FINAL_FEATURES,
+    "ALL_FEATURES": ALL_FEATURES,
+    "ADDITIONAL_FEATURES": ADDITIONAL_FEATURES,
+    "COLUMN_ENTROPY_SUMMARY_FEATURES": COLUMN_ENTROPY_SUMMARY_FEATURES,
+    "LABEL_GENERATION_FEATURES": LABEL_GENERATION_FEATURES,
+}
+
+Filter = Tuple[str, str, object]
+
+
+def get_feature_columns(features: Union[str, List[str]], include_label: bool = True) -> List[str]:
+    """
+    Returns the columns for the given feature group name (e.g. "FINAL_FEATURES", see FEATURE_GROUPS) or list of columns,
+    followed by the LABEL column if include_label is set.
+    """
+    if isinstance(features, str):
+        if features not in FEATURE_GROUPS:
+            raise ValueError(
+                f"Unknown feature group {features}, choose one of {', '.join(FEATURE_GROUPS)} or provide a list of columns."
+            )
+        features = FEATURE_GROUPS[features]
+
+    columns = list(dict.fromkeys(features))
+    if include_label and LABEL not in columns:
+        columns.append(LABEL)
+    return columns
+
+
+def load_training_data(
+    path: str,
+    features: Union[str, List[str]] = "FINAL_FEATURES",
+    filters: Optional[List[Filter]] = None,
+    include_label: bool = True,
+) -> pd.DataFrame:
+    """
+    Loads the given feature group (or list of columns) and the LABEL column from a training data Parquet file
+    or a partitioned Parquet dataset (see rules/scripts/aggregate_training_data.py).
+    Only the requested columns are read from the file, heavy columns like column_entropies or the Newick strings
+    are not loaded unless they are part of the requested features.
+
+    filters are applied while reading, e.g. [("data_type", "==", "DNA")] or [("num_taxa", ">=", 10)].
+    Row groups and partitions not matching the filters are skipped.
+    """
+    columns = get_feature_columns(features, include_label)
+
+    available = set(pq.ParquetDataset(path).schema.names)
+    missing = [col for col in columns if col not in available]
+    if missing:
+        raise ValueError(f"The given training data {path} does not contain the columns {', '.join(missing)}.")
+
+    table = pq.read_table(path, columns=columns, filters=filters)
+    return table.to_pandas()